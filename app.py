@@ -1,133 +1,171 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, date
+from datetime import date
+from collections import OrderedDict
+import hashlib
+import io
 import os
+import threading
+
+import od_ledger
+from attendance_pipeline import (
+    PARSER_VERSION, OD_MATCH_KEYS, feature_engineering, compact_schema, merge_od, summarize_attendance,
+)
+from excel_ingest import default_engine, read_erp_workbook
+from attendance_history import add_to_history, list_history_dates, query_history
+from batch_import import import_files, list_import_files
+from stage_profiler import StageProfiler, METRICS_LOG_FILE
+
+try:
+    import pyarrow  # noqa: F401  (optional: enables the columnar uploads store)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 st.set_page_config(page_title="College Staff Attendance Dashboard", layout="wide")
 st.title("College Staff Attendance Dashboard")
 
-# --- Feature engineering function ---
-def feature_engineering(df):
-    df = df.copy()
-    df['Shift'] = df.get('Shift', 'GS').fillna('GS')
-    df['InTime'] = df.get('InTime', '').fillna('').astype(str).str.strip()
-
-    def parse_time(s):
+# --- Opt-in stage profiling (wall time, rows, peak allocation per rerun) ---
+profile_stages = st.sidebar.checkbox("Profile pipeline stages", value=False,
+                                     help=f"Shows a diagnostics panel and appends each rerun to {METRICS_LOG_FILE}.")
+profiler = StageProfiler(profile_stages)
+
+# --- Parsed-file cache (content hash + parser version -> engineered DataFrame) ---
+CACHE_DIR = ".parsed_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024  # pickles on disk; least recently used ones go first
+
+class ParsedFileCache:
+    def __init__(self, cache_dir, max_bytes, disk_max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()  # key -> (DataFrame, size in bytes)
+        self.total_bytes = 0
+        self.lock = threading.Lock()  # shared by every session through st.cache_resource
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_stale_versions()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    @staticmethod
+    def _discard(path):
         try:
-            return datetime.strptime(s, '%H:%M:%S').time() if s and ':' in s else np.nan
-        except:
-            return np.nan
-    df['InTime_obj'] = df['InTime'].apply(parse_time)
-
-    if 'TotDur_min' not in df:
-        dur_col = 'Tot. Dur.' if 'Tot. Dur.' in df.columns else None
-        if dur_col:
-            # KEY FIX: only call .fillna on Series, not on string
-            df['TotDur'] = df[dur_col].fillna('').astype(str).str.strip()
-        else:
-            df['TotDur'] = ""
-        def parse_dur(s):
-            for fmt in ('%H:%M:%S','%H:%M'):
-                try:
-                    if s and ':' in s:
-                        t = datetime.strptime(s, fmt)
-                        return t.hour*60 + t.minute
-                except:
-                    continue
-            return np.nan
-        df['TotDur_min'] = df['TotDur'].apply(parse_dur)
-
-    sched = datetime.strptime('09:00:00', '%H:%M:%S').time()
-    df['Delay_Minutes'] = df['InTime_obj'].apply(
-        lambda t: (t.hour - sched.hour)*60 + (t.minute - sched.minute) if pd.notnull(t) else np.nan)
-    df['Delay_Flag'] = (df['Delay_Minutes'] > 0).astype(int)
-
-    scheduled_duration = 6 * 60
-    df['Early_Leave_Min'] = df['TotDur_min'].apply(lambda x: scheduled_duration - x if pd.notnull(x) and x < scheduled_duration else 0)
-    df['Overtime_Min'] = df['TotDur_min'].apply(lambda x: x - scheduled_duration if pd.notnull(x) and x > scheduled_duration else 0)
-
-    status = df.get('Status', '').fillna('').str.lower()
-    remarks = df.get('Remarks', '').fillna('').str.lower()
-    df['Is_Absent'] = status.str.contains("absent").astype(int)
-    df['Is_Present'] = status.str.contains("present").astype(int)
-    df['Is_Half_Day'] = status.str.contains("½present").astype(int)
-    df['Has_Permission'] = remarks.str.contains("permission").astype(int)
-
-    display_cols = ["Department", "E. Code", "Name", "Shift", "InTime", "Delay_Minutes", "Delay_Flag",
-                    "TotDur_min", "Early_Leave_Min", "Overtime_Min",
-                    "Is_Absent", "Is_Present", "Is_Half_Day", "Has_Permission", "Status", "Remarks"]
-    for col in display_cols:
-        if col not in df.columns:
-            df[col] = np.nan
-    return df[display_cols]
-
-# --- Parse raw Excel attendance into DataFrame ---
-def process_attendance_excel(raw):
-    tables = []
-    i = 0
-    while i < len(raw):
-        if raw.iloc[i].astype(str).str.fullmatch("Department", na=False).any():
-            dept_row = raw.iloc[i]
-            dept_name = next((v.strip() for v in dept_row.values if isinstance(v, str) and v.strip() not in ["", "Department"]), None)
-            header_row = i + 1
-            data_start = header_row + 1
-            data_end = data_start
-            header_vals = raw.iloc[header_row].tolist()
-            cols_used = [j for j, v in enumerate(header_vals) if isinstance(v, str) and v.strip() != ""]
-            if not cols_used:
-                i = data_end
+            os.remove(path)
+        except OSError:
+            pass  # already removed by another session or server process
+
+    def _remove_stale_versions(self):
+        # Keys end in the parser version, so pickles written by an older parser can never be hit again
+        current = f"_v{PARSER_VERSION}.pkl"
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl") and not name.endswith(current):
+                self._discard(os.path.join(self.cache_dir, name))
+
+    def _prune_disk(self, keep_path):
+        # Disk hits refresh a pickle's mtime, so the oldest mtime is the least recently used
+        files, total = [], 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".pkl"):
                 continue
-            last_col = max(cols_used)
-            headers = [header_vals[j] if isinstance(header_vals[j], str) and header_vals[j].strip() != '' else f'unnamed_{j}' for j in range(last_col + 1)]
-            while data_end < len(raw) and not raw.iloc[data_end].astype(str).str.fullmatch("Department", na=False).any():
-                data_end += 1
-            datablock = raw.iloc[data_start:data_end, :last_col + 1].copy()
-            datablock.columns = headers
-            datablock["Department"] = dept_name
-            if 'E. Code' in datablock.columns:
-                datablock = datablock[datablock["E. Code"].notnull() & (datablock["E. Code"].str.strip() != "")]
-            if not datablock.empty:
-                tables.append(datablock.reset_index(drop=True))
-            i = data_end
-        else:
-            i += 1
-    if not tables:
-        st.error("No department tables found! Please check your Excel format.")
-        return pd.DataFrame()
-    df = pd.concat(tables, ignore_index=True)
-    # Fix column name if needed
-    if " InTime" in df.columns and "InTime" not in df.columns:
-        df = df.rename(columns={" InTime": "InTime"})
-    return feature_engineering(df)
-
-# --- Upload and process main attendance file ---
-uploaded = st.file_uploader("Upload your raw Excel attendance (ERP-Portal) or previously cleaned CSV:", type=["xlsx", "csv"])
-df = None
-if uploaded is not None:
-    ext = uploaded.name.split('.')[-1].lower()
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            total += info.st_size
+            if entry.path != keep_path:
+                files.append((info.st_mtime, info.st_size, entry.path))
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            self._discard(path)
+            total -= size
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            try:
+                df = pd.read_pickle(path)
+            except Exception:
+                self._discard(path)
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._remember(key, df)
+            return df
+        return None
+
+    def put(self, key, df):
+        # Per-thread temp name: two sessions may parse the same upload at once
+        tmp_path = f"{self._disk_path(key)}.{threading.get_ident()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, self._disk_path(key))
+        self._prune_disk(self._disk_path(key))
+        self._remember(key, df)
+
+    def _remember(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return  # too big to keep in memory; the disk copy still avoids re-parsing
+            self.entries[key] = (df, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+@st.cache_resource
+def get_parsed_cache():
+    return ParsedFileCache(CACHE_DIR, CACHE_MAX_BYTES, CACHE_DISK_MAX_BYTES)
+
+def parse_attendance_bytes(data, ext):
     if ext == "xlsx":
-        raw = pd.read_excel(uploaded, header=None, dtype=str)
-        df = process_attendance_excel(raw)
+        engine = default_engine()
+        with profiler.stage(f"read + block scan ({engine})") as rec:
+            frame = read_erp_workbook(data, engine)
+            rec["rows"] = len(frame)
+        if frame.empty:
+            return frame
     elif ext == "csv":
-        df = pd.read_csv(uploaded)
-        df = feature_engineering(df)
+        with profiler.stage("read_csv") as rec:
+            frame = pd.read_csv(io.BytesIO(data))
+            rec["rows"] = len(frame)
     else:
-        st.error("Unsupported file format.")
-
-# Add Date if missing
-if df is not None and 'Date' not in df.columns:
-    attendance_date = st.sidebar.date_input("Select attendance date (required for OD merge)", value=date.today())
-    df['Date'] = pd.to_datetime(attendance_date).date()
-
-# --- Sidebar filters for uploaded data ---
-if df is not None and not df.empty:
-    departments = sorted(df['Department'].dropna().unique())
-    dept_choice = st.sidebar.selectbox("Select Department", ["All"] + departments)
-    search_code = st.sidebar.text_input("Search by E. Code or Name")
-    status_filter = st.sidebar.multiselect("Filter by Status", ["Present", "Absent", "Delayed"], default=[])
-
-    filtered_df = df.copy()
+        return None
+    with profiler.stage("feature_engineering", rows=len(frame)):
+        return feature_engineering(frame)
+
+def attendance_cache_key(data, ext):
+    return f"{hashlib.sha256(data).hexdigest()}_{ext}_v{PARSER_VERSION}"
+
+def load_attendance_file(data, ext, key=None):
+    with profiler.stage("load attendance file") as rec:
+        cache = get_parsed_cache()
+        key = key or attendance_cache_key(data, ext)
+        df = cache.get(key)
+        rec["cache"] = "hit" if df is not None else "miss"
+        if df is None:
+            df = parse_attendance_bytes(data, ext)
+            if df is None or df.empty:
+                return df
+            cache.put(key, df)
+        rec["rows"] = len(df)
+        # Callers add columns (e.g. Date), so never hand out the cached object itself
+        return df.copy()
+
+# --- Dashboard filters (shared by the in-memory and streaming views) ---
+def apply_dashboard_filters(frame, dept_choice, search_code, status_filter):
+    filtered_df = frame.copy()
     if dept_choice != "All":
         filtered_df = filtered_df[filtered_df['Department'] == dept_choice]
     if search_code:
@@ -145,26 +183,283 @@ if df is not None and not df.empty:
             elif s == "Delayed":
                 cond = cond | (filtered_df['Delay_Flag'] == 1)
         filtered_df = filtered_df[cond]
+    return filtered_df
+
+# --- Materialized per-department aggregates (additive, so departments combine by summing rows) ---
+AGG_COLS = ["Staff", "Is_Present", "Is_Absent", "Has_Permission", "Late", "Late_Minutes"]
+AGG_CACHE_ENTRIES = 32
+
+def chunk_aggregates(chunk, by):
+    late = chunk['Delay_Flag'] == 1
+    return chunk.assign(
+        Staff=1,
+        Late=late.astype(int),
+        Late_Minutes=chunk['Delay_Minutes'].where(late, 0).astype('int64'),  # Int16 sums would overflow
+    ).groupby(by, dropna=False, observed=True)[AGG_COLS].sum()
+
+def fold_aggregates(total, part):
+    return part if total is None else total.add(part, fill_value=0)
+
+def combine_departments(dept_agg, dept_choice):
+    rows = dept_agg if dept_choice == "All" else dept_agg[dept_agg.index == dept_choice]
+    return rows.sum().reindex(AGG_COLS, fill_value=0)
+
+# --- Precomputed filter indexes (built once per dataset, reused by every filter change) ---
+REGEX_METACHARS = set(".^$*+?{}[]\\|()")
+
+class FilterIndex:
+    STATUS_COLS = {"Present": "Is_Present", "Absent": "Is_Absent", "Delayed": "Delay_Flag"}
+
+    def __init__(self, frame):
+        self.n = len(frame)
+        self.dept_rows = {dept: rows for dept, rows in
+                          frame.groupby('Department', observed=True, sort=False).indices.items()}
+        self.status_masks = {label: (frame[col] == 1).to_numpy() for label, col in self.STATUS_COLS.items()}
+        self.text = [self._text_index(frame[col]) for col in ('E. Code', 'Name')]
+        self.agg_cache = OrderedDict()  # (search, status filter) -> per-department aggregates
+        self.agg_lock = threading.Lock()
+
+    @staticmethod
+    def _text_index(series):
+        # Search runs over distinct values; a trigram map narrows literal queries further
+        codes, uniques = pd.factorize(series.astype(str))
+        lowered = [str(v).lower() for v in uniques]
+        trigrams = {}
+        for uid, value in enumerate(lowered):
+            for i in range(len(value) - 2):
+                trigrams.setdefault(value[i:i + 3], set()).add(uid)
+        return codes, pd.Series(uniques, dtype=object), lowered, trigrams
+
+    def _search_mask(self, text_index, query):
+        codes, uniques, lowered, trigrams = text_index
+        if not REGEX_METACHARS.intersection(query):
+            needle = query.lower()
+            candidates = range(len(lowered))
+            if len(needle) >= 3:
+                candidates = set.intersection(*(trigrams.get(needle[i:i + 3], set()) for i in range(len(needle) - 2)))
+            hits = [uid for uid in candidates if needle in lowered[uid]]
+        else:
+            # Regex queries keep str.contains semantics, evaluated once per distinct value
+            hits = np.flatnonzero(uniques.str.contains(query, case=False, na=False).to_numpy())
+        return np.isin(codes, np.fromiter(hits, dtype=np.intp, count=len(hits)))
+
+    def mask(self, dept_choice, search_code, status_filter):
+        mask = np.ones(self.n, dtype=bool)
+        if dept_choice != "All":
+            mask = np.zeros(self.n, dtype=bool)
+            mask[self.dept_rows.get(dept_choice, [])] = True
+        if search_code:
+            mask &= self._search_mask(self.text[0], search_code) | self._search_mask(self.text[1], search_code)
+        if status_filter:
+            status_mask = np.zeros(self.n, dtype=bool)
+            for label in status_filter:
+                if label in self.status_masks:
+                    status_mask |= self.status_masks[label]
+            mask &= status_mask
+        return mask
+
+    def rows(self, dept_choice, search_code, status_filter):
+        # Positions of the matching rows; callers take only the slice they render or export
+        return np.flatnonzero(self.mask(dept_choice, search_code, status_filter))
+
+    def department_aggregates(self, frame, search_code="", status_filter=()):
+        # Keyed without the department choice: picking a department just selects/sums rows of this table
+        key = (search_code, tuple(status_filter))
+        with self.agg_lock:
+            if key in self.agg_cache:
+                self.agg_cache.move_to_end(key)
+                return self.agg_cache[key]
+        rows = np.flatnonzero(self.mask("All", search_code, status_filter))
+        dept_agg = chunk_aggregates(frame.iloc[rows], "Department")
+        with self.agg_lock:
+            self.agg_cache[key] = dept_agg
+            while len(self.agg_cache) > AGG_CACHE_ENTRIES:
+                self.agg_cache.popitem(last=False)
+        return dept_agg
+
+@st.cache_resource(max_entries=8)
+def get_filter_index(key, _frame):
+    return FilterIndex(_frame)
+
+# --- Streaming mode for large cleaned CSV exports ---
+STREAMING_CSV_THRESHOLD_BYTES = 50 * 1024 * 1024
+CSV_CHUNK_ROWS = 50_000
+STREAM_PAGE_ROWS = 200
+
+def iter_engineered_csv(data, chunk_rows=CSV_CHUNK_ROWS):
+    for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunk_rows):
+        yield feature_engineering(chunk)
+
+@st.cache_data(max_entries=4, show_spinner="Streaming CSV aggregates...")
+def stream_csv_summary(key, _data):
+    # key is the content hash; the bytes themselves are not hashed again by Streamlit
+    rows, by_dept, by_name = 0, None, None
+    for chunk in iter_engineered_csv(_data):
+        rows += len(chunk)
+        by_dept = fold_aggregates(by_dept, chunk_aggregates(chunk, "Department"))
+        by_name = fold_aggregates(by_name, chunk_aggregates(chunk, "Name"))
+    return rows, by_dept, by_name
+
+@st.cache_data(max_entries=32, show_spinner="Streaming CSV page...")
+def stream_csv_page(key, _data, dept_choice, search_code, status_filter, page):
+    # One pass over the chunks: count/sum every match, keep only the rows on the requested page
+    start, stop = page * STREAM_PAGE_ROWS, (page + 1) * STREAM_PAGE_ROWS
+    matched, totals, window = 0, None, []
+    for chunk in iter_engineered_csv(_data):
+        chunk = apply_dashboard_filters(chunk, dept_choice, search_code, status_filter)
+        if matched < stop and matched + len(chunk) > start:
+            window.append(chunk.iloc[max(start - matched, 0):stop - matched])
+        matched += len(chunk)
+        part = chunk[["Is_Present", "Is_Absent", "Has_Permission"]].sum()
+        totals = part if totals is None else totals + part
+    page_df = pd.concat(window, ignore_index=True) if window else pd.DataFrame()
+    return matched, totals, page_df
+
+# --- Paginated tables and on-demand CSV exports ---
+TABLE_PAGE_ROWS = STREAM_PAGE_ROWS
+EXPORT_CACHE_ENTRIES = 8
+
+def page_bounds(total, key, page_rows=TABLE_PAGE_ROWS):
+    # Only the selected page of a table is sliced out and sent to the browser
+    pages = max(1, -(-total // page_rows))
+    page = 0
+    if pages > 1:
+        page = min(st.number_input(f"Page (of {pages})", min_value=1, value=1, step=1, key=key), pages) - 1
+    return page * page_rows, min((page + 1) * page_rows, total)
+
+def page_caption(start, stop, total):
+    st.caption(f"Rows {min(start + 1, total):,}-{stop:,} of {total:,}")
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def csv_export(key, _frame, _rows=None, _stage=None, _source=None):
+    # key identifies the data and filter state; runs only when a download button is clicked
+    rows = np.arange(len(_frame)) if _rows is None else _rows
+    # The click comes after the rerun's profiler has finished, so a profiled export logs its own line
+    export_profiler = StageProfiler(_stage is not None)
+    with export_profiler.stage(_stage, rows=len(rows)) as rec:
+        buf = io.BytesIO()
+        flags = {col: "int8" for col in _frame.columns if _frame[col].dtype == bool}  # exports keep 0/1 flags
+        for start in range(0, max(len(rows), 1), CSV_CHUNK_ROWS):
+            # Written chunk by chunk, so the whole export never exists as one str before encoding
+            chunk = _frame.iloc[rows[start:start + CSV_CHUNK_ROWS]].astype(flags)
+            chunk.to_csv(buf, index=False, header=start == 0)
+        data = buf.getvalue()
+        rec["bytes"] = len(data)
+    export_profiler.finish(source=_source)
+    return data
+
+# --- Upload and process main attendance file ---
+uploaded = st.file_uploader("Upload your raw Excel attendance (ERP-Portal) or previously cleaned CSV:", type=["xlsx", "csv"])
+df = None
+df_key = None
+stream_data = None
+if uploaded is not None:
+    ext = uploaded.name.split('.')[-1].lower()
+    if ext == "csv" and uploaded.size > STREAMING_CSV_THRESHOLD_BYTES:
+        stream_data = uploaded.getvalue()
+    elif ext in ("xlsx", "csv"):
+        df_key = attendance_cache_key(uploaded.getvalue(), ext)
+        df = load_attendance_file(uploaded.getvalue(), ext, key=df_key)
+    else:
+        st.error("Unsupported file format.")
+
+# Add Date if missing
+attendance_date = None
+if df is not None and 'Date' not in df.columns:
+    attendance_date = st.sidebar.date_input("Select attendance date (required for OD merge)", value=date.today())
+    df['Date'] = pd.to_datetime(attendance_date).date()
 
+# --- Streaming view for large CSV uploads: aggregates plus one page of rows ---
+if stream_data is not None:
+    stream_key = hashlib.sha256(stream_data).hexdigest()
+    with profiler.stage("stream summary") as rec:
+        total_rows, dept_agg, name_agg = stream_csv_summary(stream_key, stream_data)
+        rec["rows"] = total_rows
+    st.info(f"Large CSV ({total_rows:,} rows) opened in streaming mode: only the visible page is loaded into memory.")
+    departments = sorted(dept_agg.index.dropna())
+    dept_choice = st.sidebar.selectbox("Select Department", ["All"] + departments)
+    search_code = st.sidebar.text_input("Search by E. Code or Name")
+    status_filter = st.sidebar.multiselect("Filter by Status", ["Present", "Absent", "Delayed"], default=[])
+    # The page widget is drawn once the match count is known; its value from the last rerun picks the rows
+    page = max(st.session_state.get("stream_page", 1), 1) - 1
+
+    with profiler.stage("stream page") as rec:
+        matched, totals, page_df = stream_csv_page(stream_key, stream_data, dept_choice, search_code, status_filter, page)
+        last_page = max(1, -(-matched // STREAM_PAGE_ROWS)) - 1
+        if page > last_page:  # the filters now match fewer pages than the one selected
+            page = last_page
+            matched, totals, page_df = stream_csv_page(stream_key, stream_data, dept_choice, search_code, status_filter, page)
+        rec["rows"] = matched
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Staff Shown", len(filtered_df))
-    c2.metric("Present", int(filtered_df["Is_Present"].sum()))
-    c3.metric("Absent", int(filtered_df["Is_Absent"].sum()))
-    c4.metric("With Permission", int(filtered_df["Has_Permission"].sum()))
+    c1.metric("Staff Shown", matched)
+    c2.metric("Present", int(totals["Is_Present"]))
+    c3.metric("Absent", int(totals["Is_Absent"]))
+    c4.metric("With Permission", int(totals["Has_Permission"]))
 
-    st.dataframe(filtered_df, use_container_width=True)
+    start, stop = page_bounds(matched, key="stream_page", page_rows=STREAM_PAGE_ROWS)
+    st.dataframe(page_df, use_container_width=True)
+    page_caption(start, stop, matched)
 
     if st.checkbox("Show Delay/Latecomer Analysis"):
-        late_df = filtered_df[filtered_df["Delay_Flag"] == 1]
-        st.write(f"**Number of Late Staff:** {len(late_df)}")
-        if not late_df.empty:
-            st.table(late_df[["Department", "E. Code", "Name", "Shift", "InTime", "Delay_Minutes"]].sort_values("Delay_Minutes", ascending=False))
-        st.bar_chart(late_df.groupby("Department")["Delay_Flag"].sum())
+        st.write(f"**Number of Late Staff:** {int(dept_agg['Late'].sum())}")
+        st.bar_chart(dept_agg["Late"])
 
     if st.checkbox("Show Department-wise Summary"):
-        st.bar_chart(df.groupby("Department")["Is_Present"].sum())
+        st.bar_chart(dept_agg["Is_Present"])
+
+    if st.checkbox("Show per-name totals"):
+        st.dataframe(name_agg.rename(columns={"Is_Present": "Present", "Is_Absent": "Absent"}), use_container_width=True)
+
+# --- Sidebar filters for uploaded data ---
+elif df is not None and not df.empty:
+    departments = sorted(df['Department'].dropna().unique())
+    dept_choice = st.sidebar.selectbox("Select Department", ["All"] + departments)
+    search_code = st.sidebar.text_input("Search by E. Code or Name")
+    status_filter = st.sidebar.multiselect("Filter by Status", ["Present", "Absent", "Delayed"], default=[])
+
+    with profiler.stage("filters + aggregates") as rec:
+        filter_index = get_filter_index(df_key, df)
+        filtered_rows = filter_index.rows(dept_choice, search_code, status_filter)
+        dept_agg = filter_index.department_aggregates(df, search_code, status_filter)
+        totals = combine_departments(dept_agg, dept_choice)
+        rec["rows"] = len(filtered_rows)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Staff Shown", int(totals["Staff"]))
+    c2.metric("Present", int(totals["Is_Present"]))
+    c3.metric("Absent", int(totals["Is_Absent"]))
+    c4.metric("With Permission", int(totals["Has_Permission"]))
 
-    st.download_button("Download filtered analytics as CSV", data=filtered_df.to_csv(index=False), file_name="attendance_analytics.csv")
+    start, stop = page_bounds(len(filtered_rows), key="grid_page")
+    st.dataframe(df.iloc[filtered_rows[start:stop]], use_container_width=True)
+    page_caption(start, stop, len(filtered_rows))
+
+    if st.checkbox("Show Delay/Latecomer Analysis"):
+        late_rows = filtered_rows[df["Delay_Flag"].to_numpy()[filtered_rows] == 1]
+        st.write(f"**Number of Late Staff:** {int(totals['Late'])}")
+        if totals["Late"]:
+            st.write(f"**Average Delay:** {totals['Late_Minutes'] / totals['Late']:.1f} min")
+        if len(late_rows):
+            # Most delayed first; only the visible page is materialized
+            delay = df["Delay_Minutes"].to_numpy(dtype="float64", na_value=np.nan)
+            late_rows = late_rows[np.argsort(-delay[late_rows], kind="stable")]
+            start, stop = page_bounds(len(late_rows), key="late_page")
+            st.table(df.iloc[late_rows[start:stop]][["Department", "E. Code", "Name", "Shift", "InTime", "Delay_Minutes"]])
+            page_caption(start, stop, len(late_rows))
+        late_by_dept = dept_agg.loc[dept_agg.index.notna(), "Late"]
+        if dept_choice != "All":
+            late_by_dept = late_by_dept[late_by_dept.index == dept_choice]
+        st.bar_chart(late_by_dept[late_by_dept > 0].rename("Delay_Flag"))
+
+    if st.checkbox("Show Department-wise Summary"):
+        overall = filter_index.department_aggregates(df)
+        st.bar_chart(overall.loc[overall.index.notna(), "Is_Present"])
+
+    export_key = (df_key, attendance_date, dept_choice, search_code, tuple(status_filter))
+    export_stage = "to_csv (filtered)" if profile_stages else None
+    st.download_button("Download filtered analytics as CSV",
+                       data=lambda: csv_export(export_key, df, filtered_rows, export_stage, uploaded.name),
+                       file_name="attendance_analytics.csv", mime="text/csv")
     st.caption("Tip: Filter/search for your target group, then download as CSV!")
 else:
     st.info("Please upload your raw Excel or previously cleaned CSV to begin.")
@@ -173,6 +468,62 @@ else:
 SAVE_DIR = "uploads"
 os.makedirs(SAVE_DIR, exist_ok=True)
 
+# --- Columnar (Parquet) copy of each upload with the engineered schema ---
+COLUMNAR_DIR = "uploads_columnar"
+
+def columnar_path(file_name):
+    return os.path.join(COLUMNAR_DIR, f"{file_name}.v{PARSER_VERSION}.parquet")
+
+def columnar_is_fresh(file_name):
+    source = os.path.join(SAVE_DIR, file_name)
+    target = columnar_path(file_name)
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+def to_columnar_schema(df):
+    # The engineered schema maps 1:1 to Parquet: categoricals dictionary-encoded, bool flags, Int16 minutes
+    return compact_schema(df)
+
+def ingest_columnar(file_name):
+    ext = file_name.split('.')[-1].lower()
+    with open(os.path.join(SAVE_DIR, file_name), "rb") as f:
+        df = load_attendance_file(f.read(), ext)
+    if df is None or df.empty:
+        return None
+    os.makedirs(COLUMNAR_DIR, exist_ok=True)
+    target = columnar_path(file_name)
+    tmp_target = target + ".tmp"
+    try:
+        to_columnar_schema(df).to_parquet(tmp_target, engine="pyarrow", index=False)
+        os.replace(tmp_target, target)
+    except Exception as e:
+        st.sidebar.warning(f"Could not write columnar copy of {file_name}: {e}")
+    return df
+
+def load_saved_file(file_name):
+    if not HAS_PYARROW:
+        ext = file_name.split('.')[-1].lower()
+        with open(os.path.join(SAVE_DIR, file_name), "rb") as f:
+            return load_attendance_file(f.read(), ext)
+    if columnar_is_fresh(file_name):
+        return pd.read_parquet(columnar_path(file_name), engine="pyarrow", memory_map=True)
+    df = ingest_columnar(file_name)
+    return to_columnar_schema(df) if df is not None else None
+
+def remove_columnar(file_name):
+    if os.path.isdir(COLUMNAR_DIR):
+        for name in os.listdir(COLUMNAR_DIR):
+            if name.startswith(f"{file_name}.v"):
+                os.remove(os.path.join(COLUMNAR_DIR, name))
+
+def backfill_columnar_store():
+    built = 0
+    for file_name in sorted(os.listdir(SAVE_DIR)):
+        ext = file_name.split('.')[-1].lower()
+        if ext in ("xlsx", "csv") and not columnar_is_fresh(file_name):
+            ingest_columnar(file_name)
+            built += columnar_is_fresh(file_name)
+    return built
+
 st.sidebar.markdown("## Previously Uploaded Files")
 saved_files = sorted(os.listdir(SAVE_DIR))
 file_to_delete = None
@@ -187,6 +538,7 @@ for file in saved_files:
 
 if file_to_delete:
     os.remove(os.path.join(SAVE_DIR, file_to_delete))
+    remove_columnar(file_to_delete)
     st.sidebar.success(f"Deleted file: {file_to_delete}")
     st.experimental_rerun()
 
@@ -195,34 +547,82 @@ saved_files = sorted(os.listdir(SAVE_DIR))
 selected_saved_file = st.sidebar.selectbox("Load previously uploaded file", [""] + saved_files)
 df_saved = None
 if selected_saved_file:
-    path = os.path.join(SAVE_DIR, selected_saved_file)
     ext = selected_saved_file.split('.')[-1].lower()
-    if ext == "xlsx":
-        raw_saved = pd.read_excel(path, header=None, dtype=str)
-        df_saved = process_attendance_excel(raw_saved)
-    elif ext == "csv":
-        df_saved = pd.read_csv(path)
-        df_saved = feature_engineering(df_saved)
+    if ext in ("xlsx", "csv"):
+        with profiler.stage("load saved file") as rec:
+            df_saved = load_saved_file(selected_saved_file)
+            rec["rows"] = len(df_saved) if df_saved is not None else 0
     else:
         st.sidebar.error("Unsupported saved file format.")
 
 # Save newly uploaded files to disk automatically
 if uploaded is not None:
     save_path = os.path.join(SAVE_DIR, uploaded.name)
-    with open(save_path, "wb") as f:
-        f.write(uploaded.getbuffer())
+    upload_bytes = uploaded.getvalue()
+    unchanged = False
+    if os.path.exists(save_path) and os.path.getsize(save_path) == len(upload_bytes):
+        with open(save_path, "rb") as f:
+            unchanged = f.read() == upload_bytes
+    if not unchanged:  # rewriting on every rerun would also invalidate the columnar copy
+        with open(save_path, "wb") as f:
+            f.write(upload_bytes)
+    if HAS_PYARROW and stream_data is None and uploaded.name.split('.')[-1].lower() in ("xlsx", "csv") and not columnar_is_fresh(uploaded.name):
+        ingest_columnar(uploaded.name)
     st.sidebar.success(f"Saved: {uploaded.name}")
 
+if HAS_PYARROW and st.sidebar.button("Backfill columnar store for saved uploads"):
+    built = backfill_columnar_store()
+    st.sidebar.success(f"Columnar store up to date ({built} file(s) ingested).")
+
+# --- Batch import: parse a folder of exports in a process pool straight into the attendance history ---
+if HAS_PYARROW:
+    with st.sidebar.expander("Batch import a folder"):
+        batch_dir = st.text_input("Folder with ERP .xlsx / cleaned .csv files", value=SAVE_DIR)
+        if st.button("Import folder into attendance history"):
+            if not os.path.isdir(batch_dir):
+                st.error(f"Not a folder: {batch_dir}")
+            else:
+                batch_paths = list_import_files(batch_dir)
+                bar = st.progress(0.0, text=f"Parsing {len(batch_paths)} file(s)...")
+
+                def report_progress(done, total, result):
+                    bar.progress(done / total, text=f"{done}/{total} parsed: {result.source}")
+
+                batch_results = import_files(batch_paths, progress=report_progress)
+                for result in batch_results:
+                    if result.error:
+                        st.warning(f"{result.source}: {result.error}")
+                    else:
+                        add_to_history(result.frame, result.source)
+                imported = sum(result.error is None for result in batch_results)
+                st.success(f"Imported {imported} of {len(batch_results)} file(s) into attendance history.")
+
 # --- OD file upload ---
 od_file = st.file_uploader("Upload OD CSV (On Duty List)", type=["csv"], key="od_uploader")
 od_df = None
 if od_file:
     try:
-        od_df = pd.read_csv(od_file)
+        od_df = pd.read_csv(od_file, dtype={"E. Code": str})
         st.success("OD file loaded.")
     except Exception as e:
         st.error(f"Failed to load OD CSV: {e}")
 
+# --- OD/leave ledger written by the staff attendance app (newod.py) ---
+use_ledger = os.path.exists(od_ledger.LEDGER_DB_FILE) and st.sidebar.checkbox(
+    "Use OD ledger from staff submissions", value=od_df is None)
+ledger_types = ["OD"]
+if use_ledger:
+    ledger_types = st.sidebar.multiselect("Ledger entries counted as OD", od_ledger.ATTENDANCE_TYPES, default=["OD"])
+
+def apply_od(frame, start, end):
+    # Each source is merged on the key it carries: the uploaded list on the chosen column, the ledger
+    # (rows for [start, end], one indexed query) on the staff login ID
+    if od_df is not None:
+        frame = merge_od(frame, od_df, od_match_on)
+    if use_ledger:
+        frame = merge_od(frame, od_ledger.query_range(start, end, ledger_types), "E. Code")
+    return frame
+
 # Add Date column to saved file data for OD merge if missing
 if df_saved is not None and 'Date' not in df_saved.columns:
     attendance_date_saved = st.sidebar.date_input("Set date for saved data (required for OD merge)", value=date.today())
@@ -230,60 +630,63 @@ if df_saved is not None and 'Date' not in df_saved.columns:
 
 # Choose the active DataFrame: prefer uploaded, else saved
 df_work = df if df is not None and not df.empty else df_saved
-
-# Merge OD data if available
-def merge_od(main_df, od_data):
-    main_df = main_df.copy()
-    if 'Date' not in main_df.columns:
-        st.error("Main data missing 'Date' column required for OD merge.")
-        return main_df
-    if 'Date' not in od_data.columns or 'Name' not in od_data.columns:
-        st.error("OD file must have 'Name' and 'Date' columns.")
-        return main_df
-
-    main_df['Date'] = pd.to_datetime(main_df['Date'], errors='coerce').dt.date
-    od_data['Date'] = pd.to_datetime(od_data['Date'], errors='coerce').dt.date
-    od_set = set(od_data[['Name', 'Date']].dropna().itertuples(index=False, name=None))
-
-    def status_update(row):
-        key = (row['Name'], row['Date'])
-        if key in od_set and row.get('Is_Absent', 0) == 1:
-            return 'OD'
-        return row.get('Status', '')
-
-    main_df['Status_old'] = main_df.get('Status', '')
-    main_df['Status'] = main_df.apply(status_update, axis=1)
-    main_df['Is_OD'] = (main_df['Status'] == 'OD').astype(int)
-    main_df.loc[main_df['Is_OD'] == 1, 'Is_Absent'] = 0
-    main_df.loc[main_df['Is_OD'] == 1, 'Is_Present'] = 0
-    return main_df
-
-if df_work is not None and od_df is not None:
-    df_work = merge_od(df_work, od_df)
+active_source = uploaded.name if df is not None and not df.empty else selected_saved_file
+
+if HAS_PYARROW and df_work is not None and not df_work.empty and active_source:
+    if st.sidebar.button(f"Add {active_source} to attendance history"):
+        n_days = add_to_history(df_work, active_source)
+        st.sidebar.success(f"Recorded {active_source} in attendance history ({n_days} day(s)).")
+
+od_match_on = "Name"
+has_od = od_df is not None or use_ledger
+if od_df is not None:
+    # Only the uploaded list needs a choice; ledger entries are always matched on E. Code
+    od_match_on = st.sidebar.radio("Match uploaded OD entries on", OD_MATCH_KEYS, horizontal=True,
+                                   help="E. Code avoids clashes between staff with the same or differently spelled names. "
+                                        "The OD file needs a column of that name.")
+
+if df_work is not None and has_od and 'Date' in df_work.columns:
+    work_dates = pd.to_datetime(df_work['Date'], errors='coerce').dropna()
+    if not work_dates.empty:
+        with profiler.stage("merge_od", rows=len(df_work)):
+            df_work = apply_od(df_work, work_dates.min().date(), work_dates.max().date())
 
 # Attendance summary with date range filter & download in sidebar
-if df_work is not None:
+history_dates = list_history_dates() if HAS_PYARROW else []
+use_history = bool(history_dates) and st.sidebar.checkbox("Summarize across attendance history (all recorded uploads)")
+if df_work is not None or use_history:
     st.sidebar.markdown("## Attendance Summary with OD and Date Range")
-    min_dt = df_work['Date'].min() if 'Date' in df_work else date.today()
-    max_dt = df_work['Date'].max() if 'Date' in df_work else date.today()
+    if use_history:
+        min_dt, max_dt = history_dates[0], history_dates[-1]
+    else:
+        min_dt = df_work['Date'].min() if 'Date' in df_work else date.today()
+        max_dt = df_work['Date'].max() if 'Date' in df_work else date.today()
 
     start_date = st.sidebar.date_input("Start date", min_value=min_dt, max_value=max_dt, value=min_dt)
     end_date = st.sidebar.date_input("End date", min_value=min_dt, max_value=max_dt, value=max_dt)
 
     if start_date <= end_date:
-        df_work['Date'] = pd.to_datetime(df_work['Date'], errors='coerce').dt.date
-        filtered = df_work[(df_work['Date'] >= start_date) & (df_work['Date'] <= end_date)]
+        if use_history:
+            with profiler.stage("query history") as rec:
+                range_df = query_history(start_date, end_date)
+                rec["rows"] = len(range_df)
+            if has_od and not range_df.empty:
+                with profiler.stage("merge_od (history)", rows=len(range_df)):
+                    range_df = apply_od(range_df, start_date, end_date)
+        else:
+            df_work['Date'] = pd.to_datetime(df_work['Date'], errors='coerce').dt.date
+            range_df = df_work
+        filtered = range_df[(range_df['Date'] >= start_date) & (range_df['Date'] <= end_date)] if not range_df.empty else range_df
         if not filtered.empty:
-            summary = filtered.groupby('Name').agg(
-                Present=('Is_Present', 'sum'),
-                Absent=('Is_Absent', 'sum'),
-                OD=('Is_OD', 'sum'),
-            ).reset_index()
+            with profiler.stage("summary", rows=len(filtered)):
+                summary = summarize_attendance(filtered)
             st.sidebar.dataframe(summary)
-            csv_out = summary.to_csv(index=False)
+            # The summary depends on the ledger as well as the filters, so it is keyed by content (cheap: one row per name)
+            summary_key = hashlib.sha256(pd.util.hash_pandas_object(summary).to_numpy().tobytes()).hexdigest()
             st.sidebar.download_button(
                 "Download attendance summary CSV",
-                data=csv_out,
+                data=lambda: csv_export(summary_key, summary, None, "to_csv (summary)" if profile_stages else None,
+                                        active_source or None),
                 file_name=f"attendance_summary_{start_date}_to_{end_date}.csv",
                 mime='text/csv'
             )
@@ -293,3 +696,16 @@ if df_work is not None:
         st.sidebar.error("Start date must be before or equal to end date.")
 else:
     st.sidebar.info("Upload attendance and OD files to see attendance summary.")
+
+# --- Diagnostics panel for the stage profiler ---
+if profile_stages:
+    with st.expander("Diagnostics: pipeline stage timings"):
+        if profiler.records:
+            stages = pd.DataFrame(profiler.records)
+            stages["stage"] = [" " * d + name for d, name in zip(stages.pop("depth"), stages["stage"])]
+            stages["ms"] = (stages.pop("seconds") * 1000).round(1)
+            st.dataframe(stages, use_container_width=True, hide_index=True)
+        else:
+            st.write("No pipeline stages ran on this rerun.")
+        st.caption(f"Stages are appended to {METRICS_LOG_FILE}; nested stages are indented under their parent.")
+    profiler.finish(source=active_source or None)
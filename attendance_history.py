@@ -0,0 +1,90 @@
+import pandas as pd
+from datetime import date
+import json
+import os
+
+from attendance_pipeline import compact_schema
+from file_lock import exclusive_lock
+
+# Attendance history: every recorded upload, one Parquet partition per date (needs pyarrow).
+# Written by app.py (per-file button and folder import) and by `python batch_import.py <folder>`;
+# read by the dashboard's history summary.
+HISTORY_DIR = "attendance_history"
+HISTORY_MANIFEST = os.path.join(HISTORY_DIR, "manifest.json")  # source file -> dates it was recorded under
+HISTORY_LOCK_FILE = os.path.join(HISTORY_DIR, "history.lock")
+
+def history_partition(day):
+    return os.path.join(HISTORY_DIR, f"date={day.isoformat()}", "part.parquet")
+
+def load_history_manifest():
+    if not os.path.exists(HISTORY_MANIFEST):
+        return {}
+    with open(HISTORY_MANIFEST, "r") as f:
+        return json.load(f)
+
+def save_history_manifest(manifest):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    tmp_path = HISTORY_MANIFEST + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, HISTORY_MANIFEST)
+
+def write_history_partition(day, part):
+    path = history_partition(day)
+    if part.empty:
+        if os.path.exists(path):
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        return
+    # (E. Code, Date) is unique within the store: the most recently recorded row wins
+    dup = part['E. Code'].notna() & part.duplicated('E. Code', keep='last')
+    part = compact_schema(part[~dup]).sort_values('E. Code', kind='stable')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part.to_parquet(path + ".tmp", engine="pyarrow", index=False)
+    os.replace(path + ".tmp", path)
+
+def read_history_partition(day, codes=None):
+    path = history_partition(day)
+    if not os.path.exists(path):
+        return None
+    filters = [('E. Code', 'in', list(codes))] if codes else None
+    return pd.read_parquet(path, engine="pyarrow", memory_map=True, filters=filters)
+
+def add_to_history(df, source_name):
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.date
+    df = df[df['Date'].notna()]
+    df['E. Code'] = df['E. Code'].astype(str).where(df['E. Code'].notna())
+    df['Source'] = source_name
+    new_days = set(df['Date'].unique())
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    # Partitions and the manifest are read-modify-write; every session and the batch CLI share them
+    with exclusive_lock(HISTORY_LOCK_FILE):
+        manifest = load_history_manifest()
+        stale_days = {date.fromisoformat(d) for d in manifest.get(source_name, [])} - new_days
+        for day in stale_days:  # the file was re-dated: drop its rows from the old partitions
+            part = read_history_partition(day)
+            if part is not None:
+                write_history_partition(day, part[part['Source'] != source_name])
+        for day, day_df in df.groupby('Date'):
+            part = read_history_partition(day)
+            if part is not None:
+                day_df = pd.concat([part[part['Source'] != source_name], day_df], ignore_index=True)
+            write_history_partition(day, day_df)
+        manifest[source_name] = sorted(d.isoformat() for d in new_days)
+        save_history_manifest(manifest)
+    return len(new_days)
+
+def list_history_dates():
+    if not os.path.isdir(HISTORY_DIR):
+        return []
+    return sorted(date.fromisoformat(name[len("date="):]) for name in os.listdir(HISTORY_DIR)
+                  if name.startswith("date=") and os.path.exists(os.path.join(HISTORY_DIR, name, "part.parquet")))
+
+def query_history(start_date, end_date, codes=None):
+    # Only the partitions inside [start_date, end_date] are opened
+    parts = [read_history_partition(day, codes) for day in list_history_dates() if start_date <= day <= end_date]
+    parts = [p for p in parts if p is not None and not p.empty]
+    if not parts:
+        return pd.DataFrame()
+    return compact_schema(pd.concat(parts, ignore_index=True))  # also upgrades partitions with int8 flags
@@ -0,0 +1,245 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+# Parsing and analytics shared by the dashboard (app.py), batch tools and benchmarks.
+# Nothing here renders UI beyond st.error for malformed input.
+
+PARSER_VERSION = "3"  # bump whenever process_attendance_excel/feature_engineering output changes
+
+# --- Feature engineering function ---
+SCHEDULED_START_MIN = 9 * 60      # 09:00
+SCHEDULED_DURATION_MIN = 6 * 60
+_HOUR = r'(2[0-3]|[01]?\d)'
+_MINUTE = r'([0-5]?\d)'
+_SECOND = r'([0-5]?\d)'
+_INTIME_PATTERN = rf'^{_HOUR}:{_MINUTE}:{_SECOND}$'
+_DURATION_PATTERN = rf'^{_HOUR}:{_MINUTE}(?::{_SECOND})?$'
+
+def feature_engineering(df):
+    df = df.copy()
+    df['Shift'] = df.get('Shift', 'GS').fillna('GS')
+    df['InTime'] = df.get('InTime', '').fillna('').astype(str).str.strip()
+
+    # Vectorized HH:MM[:SS] parsing; the patterns mirror what strptime accepts for %H/%M/%S
+    intime_parts = df['InTime'].str.extract(_INTIME_PATTERN)
+    intime_min = intime_parts[0].astype(float) * 60 + intime_parts[1].astype(float)
+
+    if 'TotDur_min' not in df:
+        dur_col = 'Tot. Dur.' if 'Tot. Dur.' in df.columns else None
+        if dur_col:
+            # KEY FIX: only call .fillna on Series, not on string
+            df['TotDur'] = df[dur_col].fillna('').astype(str).str.strip()
+        else:
+            df['TotDur'] = ""
+        dur_parts = df['TotDur'].astype(str).str.extract(_DURATION_PATTERN)
+        df['TotDur_min'] = dur_parts[0].astype(float) * 60 + dur_parts[1].astype(float)
+
+    df['Delay_Minutes'] = intime_min - SCHEDULED_START_MIN
+    df['Delay_Flag'] = (df['Delay_Minutes'] > 0).astype(int)
+
+    tot = pd.to_numeric(df['TotDur_min'], errors='coerce')
+    df['Early_Leave_Min'] = np.where(tot < SCHEDULED_DURATION_MIN, SCHEDULED_DURATION_MIN - tot, 0)
+    df['Overtime_Min'] = np.where(tot > SCHEDULED_DURATION_MIN, tot - SCHEDULED_DURATION_MIN, 0)
+
+    status = df.get('Status', '').fillna('').str.lower()
+    remarks = df.get('Remarks', '').fillna('').str.lower()
+    df['Is_Absent'] = status.str.contains("absent").astype(int)
+    df['Is_Present'] = status.str.contains("present").astype(int)
+    df['Is_Half_Day'] = status.str.contains("½present").astype(int)
+    df['Has_Permission'] = remarks.str.contains("permission").astype(int)
+
+    display_cols = ["Department", "E. Code", "Name", "Shift", "InTime", "Delay_Minutes", "Delay_Flag",
+                    "TotDur_min", "Early_Leave_Min", "Overtime_Min",
+                    "Is_Absent", "Is_Present", "Is_Half_Day", "Has_Permission", "Status", "Remarks"]
+    for col in display_cols:
+        if col not in df.columns:
+            df[col] = np.nan
+    return compact_schema(df[display_cols])
+
+# --- Compact in-memory schema for the engineered frame ---
+CATEGORY_COLS = ["Department", "Shift", "Status", "Remarks", "Name", "InTime"]
+FLAG_COLS = ["Delay_Flag", "Is_Absent", "Is_Present", "Is_Half_Day", "Has_Permission", "Is_OD"]
+MINUTE_COLS = ["Delay_Minutes", "TotDur_min", "Early_Leave_Min", "Overtime_Min"]
+
+def compact_schema(df):
+    # Categoricals for repeated labels, bool flags and whole minutes as nullable Int16 (all within +/-24h).
+    # Idempotent, so frames read back from Parquet/pickles or older int-flag files can be passed through again.
+    converted = {}
+    for col in CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            converted[col] = df[col].astype("category")
+    for col in FLAG_COLS:
+        if col in df.columns and df[col].dtype != bool:
+            converted[col] = df[col].fillna(0).astype(bool)
+    for col in MINUTE_COLS:
+        if col in df.columns and df[col].dtype != "Int16":
+            converted[col] = pd.to_numeric(df[col], errors='coerce').round().astype("Int16")
+    return df.assign(**converted) if converted else df
+
+# --- Parse raw Excel attendance into DataFrame ---
+def find_department_blocks(raw):
+    # One vectorized pass: every row holding a "Department" cell starts a block
+    markers = np.flatnonzero(raw.eq("Department").any(axis=1).to_numpy())
+    blocks = []
+    pos = 0
+    for m in markers:
+        if m < pos:
+            continue  # consumed as the previous block's header row
+        header_row = m + 1
+        data_start = header_row + 1
+        if header_row >= len(raw):
+            break
+        nxt = np.searchsorted(markers, data_start)
+        data_end = int(markers[nxt]) if nxt < len(markers) else len(raw)
+        blocks.append((int(m), header_row, data_start, data_end))
+        pos = data_end
+    return blocks
+
+def _block_headers(header_vals):
+    cols_used = [j for j, v in enumerate(header_vals) if isinstance(v, str) and v.strip() != ""]
+    if not cols_used:
+        return None
+    return tuple(header_vals[j] if isinstance(header_vals[j], str) and header_vals[j].strip() != '' else f'unnamed_{j}'
+                 for j in range(max(cols_used) + 1))
+
+def _department_name(marker_vals):
+    return next((v.strip() for v in marker_vals if isinstance(v, str) and v.strip() not in ["", "Department"]), None)
+
+def assemble_department_blocks(raw):
+    # Blocks sharing a header layout are gathered with a single take, then restored to sheet order
+    layouts = {}
+    for dept_idx, header_row, data_start, data_end in find_department_blocks(raw):
+        dept_name = _department_name(raw.iloc[dept_idx].values)
+        headers = _block_headers(raw.iloc[header_row].tolist())
+        if headers is None:
+            continue
+        rows, depts = layouts.setdefault(headers, ([], []))
+        rows.append(np.arange(data_start, data_end))
+        depts.append(np.full(data_end - data_start, dept_name, dtype=object))
+
+    tables = []
+    for headers, (rows, depts) in layouts.items():
+        positions = np.concatenate(rows)
+        datablock = raw.iloc[positions, :len(headers)].set_axis(list(headers), axis=1)
+        datablock["Department"] = np.concatenate(depts)
+        if 'E. Code' in datablock.columns:
+            keep = (datablock["E. Code"].notnull() & (datablock["E. Code"].str.strip() != "")).to_numpy()
+            datablock, positions = datablock[keep], positions[keep]
+        if not datablock.empty:
+            tables.append((positions, datablock))
+    return _concat_in_sheet_order(tables)
+
+def assemble_streamed_blocks(rows):
+    # Same result as assemble_department_blocks, but reads rows (lists of cell text or None, in sheet order)
+    # one at a time: the "Department" marker/header layout is sniffed as rows arrive and only data rows
+    # with an E. Code are kept, so the whole sheet never exists as a DataFrame.
+    layouts = {}
+    block = None  # (width, E. Code column or None, rows, positions, depts, department) of the current block
+    expect_header, dept_name = False, None
+    for pos, row in enumerate(rows):
+        if expect_header:
+            # The row after a marker is always its header, as in find_department_blocks
+            headers = _block_headers(row)
+            if headers is None:
+                block = None
+            else:
+                rows_, positions, depts = layouts.setdefault(headers, ([], [], []))
+                code_col = headers.index("E. Code") if "E. Code" in headers else None
+                block = (len(headers), code_col, rows_, positions, depts, dept_name)
+            expect_header = False
+        elif "Department" in row:
+            expect_header, dept_name = True, _department_name(row)
+            block = None
+        elif block is not None:
+            width, code_col, rows_, positions, depts, dept_name = block
+            if code_col is not None:
+                code = row[code_col] if code_col < len(row) else None
+                if code is None or code.strip() == "":
+                    continue
+            rows_.append(row[:width] if len(row) >= width else row + [None] * (width - len(row)))
+            positions.append(pos)
+            depts.append(dept_name)
+
+    tables = []
+    for headers, (rows_, positions, depts) in layouts.items():
+        if rows_:
+            datablock = pd.DataFrame(rows_, columns=list(headers), dtype=str)
+            datablock["Department"] = np.array(depts, dtype=object)
+            tables.append((np.array(positions), datablock))
+    return _concat_in_sheet_order(tables)
+
+def _concat_in_sheet_order(tables):
+    # tables: (sheet row positions, block rows) per header layout
+    if not tables:
+        st.error("No department tables found! Please check your Excel format.")
+        return pd.DataFrame()
+    # Concat in order of each layout's first surviving row so the column union matches sheet order
+    tables.sort(key=lambda t: t[0][0])
+    df = pd.concat([t[1] for t in tables], ignore_index=True)
+    order = np.argsort(np.concatenate([t[0] for t in tables]), kind="stable")
+    df = df.iloc[order].reset_index(drop=True)
+    # Fix column name if needed
+    if " InTime" in df.columns and "InTime" not in df.columns:
+        df = df.rename(columns={" InTime": "InTime"})
+    return df
+
+def process_attendance_excel(raw):
+    df = assemble_department_blocks(raw)
+    return df if df.empty else feature_engineering(df)
+
+# --- Merge OD data ---
+OD_MATCH_KEYS = ["Name", "E. Code"]
+
+def _od_match_key(series, match_on):
+    if match_on == "E. Code":
+        # Codes arrive as text from Excel but often as numbers from CSV; compare them as trimmed text
+        return series.astype(str).str.strip().where(series.notna())
+    return series
+
+def merge_od(main_df, od_data, match_on="Name"):
+    main_df = main_df.copy()
+    if 'Date' not in main_df.columns:
+        st.error("Main data missing 'Date' column required for OD merge.")
+        return main_df
+    if 'Date' not in od_data.columns or match_on not in od_data.columns:
+        st.error(f"OD file must have '{match_on}' and 'Date' columns.")
+        return main_df
+
+    main_df['Date'] = pd.to_datetime(main_df['Date'], errors='coerce').dt.date
+    od_keys = pd.DataFrame({
+        'key': _od_match_key(od_data[match_on], match_on),
+        'Date': pd.to_datetime(od_data['Date'], errors='coerce').dt.date,
+    }).dropna().drop_duplicates()
+    od_index = pd.MultiIndex.from_frame(od_keys)
+
+    # Hash-based membership of (key, Date) pairs instead of a per-row apply
+    main_keys = pd.MultiIndex.from_arrays([_od_match_key(main_df[match_on], match_on), main_df['Date']])
+    hit = main_keys.isin(od_index)
+    if 'Is_Absent' in main_df.columns:
+        hit &= (main_df['Is_Absent'] == 1).to_numpy()
+    else:
+        hit[:] = False
+
+    status = main_df['Status'] if 'Status' in main_df.columns else pd.Series('', index=main_df.index)
+    if isinstance(status.dtype, pd.CategoricalDtype) and 'OD' not in status.cat.categories:
+        status = status.cat.add_categories('OD')
+    if 'Status_old' not in main_df.columns:  # keep the pre-OD status when several OD sources are merged in turn
+        main_df['Status_old'] = main_df.get('Status', '')
+    main_df['Status'] = status.mask(hit, 'OD')
+    is_od = (main_df['Status'] == 'OD').fillna(False).to_numpy(dtype=bool)
+    main_df['Is_OD'] = is_od
+    for col in ['Is_Absent', 'Is_Present']:
+        if col in main_df.columns:
+            main_df[col] = main_df[col].fillna(0).astype(bool) & ~is_od
+    return main_df
+
+# --- Per-name attendance summary over a date range ---
+def summarize_attendance(frame):
+    if 'Is_OD' not in frame.columns:
+        frame = frame.assign(Is_OD=False)  # no OD list merged yet
+    return frame.groupby('Name', observed=True).agg(
+        Present=('Is_Present', 'sum'),
+        Absent=('Is_Absent', 'sum'),
+        OD=('Is_OD', 'sum'),
+    ).reset_index()
@@ -0,0 +1,150 @@
+import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import argparse
+import io
+import multiprocessing
+import os
+import re
+
+from attendance_history import HISTORY_DIR, add_to_history
+from attendance_pipeline import assemble_streamed_blocks, feature_engineering
+from excel_ingest import iter_sheet_rows
+
+# Parses a directory of ERP .xlsx / cleaned .csv exports in a process pool and records them in the attendance
+# history (attendance_history.py) that the dashboard summarizes.
+# Used by app.py ("Batch import" in the sidebar) and from the command line, run from the dashboard's directory:
+#   python batch_import.py uploads/ --workers 4 [--out semester.parquet]
+# Each file is parsed in its own worker call, so one malformed file only fails itself.
+
+SUPPORTED_EXTS = ("xlsx", "csv")
+ImportResult = namedtuple("ImportResult", ["source", "frame", "date", "error"])
+
+# Day-first like the ERP exports; ISO and compact YYYYMMDD are tried first because they are unambiguous
+DATE_PATTERNS = [
+    (re.compile(r"(?<!\d)(\d{4})[-_.](\d{1,2})[-_.](\d{1,2})(?!\d)"), ("y", "m", "d")),
+    (re.compile(r"(?<!\d)(20\d{2})(\d{2})(\d{2})(?!\d)"), ("y", "m", "d")),
+    (re.compile(r"(?<!\d)(\d{1,2})[-_./](\d{1,2})[-_./](\d{4})(?!\d)"), ("d", "m", "y")),
+]
+
+def find_date(text):
+    for pattern, order in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            parts = dict(zip(order, map(int, match.groups())))
+            try:
+                return date(parts["y"], parts["m"], parts["d"])
+            except ValueError:
+                continue
+    return None
+
+def _with_preamble(rows, preamble):
+    # Passes rows through, keeping the title rows before the first "Department" marker (they carry the report date)
+    rows = iter(rows)
+    for row in rows:
+        if "Department" in row:
+            yield row
+            break
+        preamble.append(row)
+        yield row
+    yield from rows
+
+def import_file(path):
+    # Runs in a worker process; every failure comes back as an ImportResult instead of an exception
+    source = os.path.basename(path)
+    ext = source.rsplit('.', 1)[-1].lower()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        preamble, dates = [], None
+        if ext == "xlsx":
+            frame = assemble_streamed_blocks(_with_preamble(iter_sheet_rows(data), preamble))
+            if not frame.empty:
+                frame = feature_engineering(frame)
+        elif ext == "csv":
+            raw = pd.read_csv(io.BytesIO(data))
+            frame = feature_engineering(raw)
+            if 'Date' in raw.columns:
+                dates = pd.to_datetime(raw['Date'], errors='coerce').dt.date
+        else:
+            return ImportResult(source, None, None, f"unsupported file type .{ext}")
+        if frame.empty:
+            return ImportResult(source, None, None, "no department tables found")
+
+        day = find_date(source)
+        if day is None:
+            day = find_date(" ".join(v for row in preamble for v in row if isinstance(v, str)))
+        if dates is not None and dates.notna().all():
+            frame['Date'] = dates  # cleaned CSVs that already carry a Date column keep it
+        elif day is not None:
+            frame['Date'] = day
+        else:
+            return ImportResult(source, None, None, "no date in the file name or sheet title")
+        frame['Source'] = source
+        return ImportResult(source, frame, day, None)
+    except Exception as e:
+        return ImportResult(source, None, None, f"{type(e).__name__}: {e}")
+
+def list_import_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.rsplit('.', 1)[-1].lower() in SUPPORTED_EXTS and not name.startswith("~$"))
+
+def import_files(paths, workers=None, progress=None):
+    # progress(done, total, result) is called in this process as each file finishes
+    results = []
+    if not paths:
+        return results
+    # spawn: forking a process that runs Streamlit's server threads is not safe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1), mp_context=context) as pool:
+        futures = {pool.submit(import_file, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # the worker itself died (e.g. out of memory)
+                result = ImportResult(os.path.basename(futures[future]), None, None, f"{type(e).__name__}: {e}")
+            results.append(result)
+            if progress:
+                progress(len(results), len(paths), result)
+    return sorted(results, key=lambda r: r.source)
+
+def combine_results(results):
+    frames = [r.frame for r in results if r.frame is not None]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values(['Date', 'Source'], kind='stable', ignore_index=True)
+
+def write_combined(frame, out_path):
+    tmp_path = out_path + ".tmp"
+    if out_path.lower().endswith(".parquet"):
+        frame.to_parquet(tmp_path, engine="pyarrow", index=False)
+    else:
+        flags = {col: "int8" for col in frame.columns if frame[col].dtype == bool}  # CSV keeps 0/1 flags like the dashboard exports
+        frame.astype(flags).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a directory of ERP attendance exports into the attendance history.")
+    parser.add_argument("directory")
+    parser.add_argument("--out", help="also export the combined rows to a .csv or .parquet file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    paths = list_import_files(args.directory)
+    def report(done, total, result):
+        status = f"ERROR {result.error}" if result.error else f"{len(result.frame)} rows, {result.date or 'Date column'}"
+        print(f"[{done}/{total}] {result.source}: {status}", flush=True)
+    results = import_files(paths, args.workers, report)
+    imported = [r for r in results if r.error is None]
+    failed = [r for r in results if r.error]
+    for result in imported:
+        add_to_history(result.frame, result.source)
+    if imported:
+        print(f"Recorded {len(imported)} file(s) in {HISTORY_DIR}")
+    if imported and args.out:
+        combined = combine_results(imported)
+        write_combined(combined, args.out)
+        print(f"Wrote {len(combined)} rows to {args.out}")
+    if failed:
+        print(f"{len(failed)} file(s) failed: " + ", ".join(r.source for r in failed))
+    raise SystemExit(1 if failed or not imported else 0)
@@ -0,0 +1,246 @@
+import pandas as pd
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+from attendance_pipeline import (
+    feature_engineering, process_attendance_excel, assemble_department_blocks, merge_od, summarize_attendance,
+)
+from excel_ingest import HAS_CALAMINE, read_erp_workbook
+import staff_store
+from synthetic_erp import generate_dataset
+
+# Times and memory-profiles each pipeline stage on synthetic ERP data.
+#   python benchmark.py --tiers small medium
+#   python benchmark.py --compare bench_results/bench_<before>.json
+#   python benchmark.py --tiers --login --bcrypt-rounds 12 --login-concurrency 32
+# Results go to bench_results/bench_<timestamp>.json; --compare prints current/baseline ratios per stage.
+
+# name: (departments, staff per department, days)
+TIERS = {
+    "small": (10, 20, 5),
+    "medium": (100, 30, 22),
+    "large": (500, 40, 22),
+    "dept10": (10, 40, 1),
+    "dept100": (100, 40, 1),
+    "dept500": (500, 40, 1),
+}
+RESULTS_DIR = "bench_results"
+
+# --- Stages ---
+# Each stage takes the dataset plus earlier stage outputs and returns its own output.
+def workbook_bytes(data):
+    out = []
+    for raw in data["raw_days"].values():
+        buf = io.BytesIO()
+        raw.to_excel(buf, header=False, index=False)
+        out.append(buf.getvalue())
+    return out
+
+# Workbook ingestion up to the pre-engineered block frame, per engine
+INGEST_STAGES = [
+    ("read_excel+block_scan", lambda wb: assemble_department_blocks(pd.read_excel(io.BytesIO(wb), header=None, dtype=str))),
+    ("ingest_openpyxl", lambda wb: read_erp_workbook(wb, "openpyxl")),
+]
+if HAS_CALAMINE:
+    INGEST_STAGES.append(("ingest_calamine", lambda wb: read_erp_workbook(wb, "calamine")))
+
+def stage_parse(data, out):
+    frames = []
+    for day, raw in data["raw_days"].items():
+        frame = process_attendance_excel(raw)
+        frame["Date"] = day
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def stage_feature_engineering(data, out):
+    return feature_engineering(pd.concat(data["day_rows"].values(), ignore_index=True))
+
+def stage_merge_od(data, out):
+    return merge_od(out["parse"], data["od"])
+
+def stage_summary(data, out):
+    return summarize_attendance(out["merge_od"])
+
+def stage_to_csv(data, out):
+    return out["merge_od"].to_csv(index=False)
+
+STAGES = [
+    ("parse", stage_parse),
+    ("feature_engineering", stage_feature_engineering),
+    ("merge_od", stage_merge_od),
+    ("summary", stage_summary),
+    ("to_csv", stage_to_csv),
+]
+
+def run_tier(name, repeat, with_excel):
+    departments, staff, days = TIERS[name]
+    data = generate_dataset(departments, staff, days)
+    result = {"departments": departments, "staff_per_department": staff, "days": days,
+              "rows": int(sum(len(r) for r in data["day_rows"].values())), "stages": {}}
+
+    if with_excel:
+        # Only reading in-memory workbooks is timed; writing them is setup
+        workbooks = workbook_bytes(data)
+        for stage, fn in INGEST_STAGES:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for wb in workbooks:
+                    fn(wb)
+                timings.append(time.perf_counter() - start)
+            tracemalloc.start()
+            fn(workbooks[0])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            result["stages"][stage] = {"min_s": min(timings), "median_s": statistics.median(timings),
+                                       "peak_mb": round(peak / 2**20, 2)}  # peak for one workbook
+
+    out = {}
+    for stage, fn in STAGES:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out[stage] = fn(data, out)
+            timings.append(time.perf_counter() - start)
+        result["stages"][stage] = {"min_s": min(timings), "median_s": statistics.median(timings)}
+
+    # Separate pass so tracemalloc overhead does not leak into the timings
+    for stage, fn in STAGES:
+        tracemalloc.start()
+        out[stage] = fn(data, out)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["stages"][stage]["peak_mb"] = round(peak / 2**20, 2)
+    return result
+
+# --- Login throughput (newod.py) ---
+BENCH_PASSWORD = "bench-password"
+
+def run_login_benchmark(users, concurrency, rounds):
+    # Concurrent login() calls against a throwaway users.db; every attempt costs one bcrypt operation
+    staff_store.BCRYPT_ROUNDS = rounds
+    # Cached resources from an earlier run belong to another users.db / cost factor
+    for resource in (staff_store.initialize_user_db, staff_store.get_hash_pool, staff_store.get_dummy_hash):
+        resource.clear()
+    start_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            staff_store.initialize_user_db()
+            ids = [f"U{i:05d}" for i in range(users)]
+            # One shared hash keeps setup cheap; checkpw costs the same whichever row it verifies
+            password_hash = staff_store.hash_password(BENCH_PASSWORD)
+            with closing(staff_store.connect_user_db()) as conn, conn:
+                conn.executemany("INSERT INTO users (user_id, password_hash, name, must_change_password)"
+                                 " VALUES (?, ?, '', 0)", [(uid, password_hash) for uid in ids])
+            staff_store.get_dummy_hash()
+
+            result = {"bcrypt_rounds": rounds, "attempts": users, "concurrency": concurrency,
+                      "hash_workers": staff_store.HASH_WORKERS, "stages": {}}
+            scenarios = [
+                ("login_ok", [(uid, BENCH_PASSWORD) for uid in ids]),
+                ("login_wrong_password", [(uid, "wrong") for uid in ids]),
+                ("login_unknown_id", [(f"X{i:05d}", "wrong") for i in range(users)]),
+            ]
+            for stage, attempts in scenarios:
+                latencies = []
+
+                def attempt(args):
+                    begin = time.perf_counter()
+                    staff_store.login(*args)
+                    latencies.append(time.perf_counter() - begin)
+
+                begin = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(attempt, attempts))
+                wall = time.perf_counter() - begin
+                latencies.sort()
+                result["stages"][stage] = {
+                    "logins_per_s": round(len(attempts) / wall, 2),
+                    "median_ms": round(statistics.median(latencies) * 1000, 1),
+                    "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+                }
+            staff_store.get_hash_pool().shutdown()
+            staff_store.get_hash_pool.clear()
+        finally:
+            os.chdir(start_dir)
+    return result
+
+def print_login_result(result, baseline=None):
+    print(f"\nlogin: bcrypt rounds {result['bcrypt_rounds']}, {result['attempts']} attempts, "
+          f"{result['concurrency']} concurrent, {result['hash_workers']} hash workers")
+    base_stages = (baseline or {}).get("stages", {})
+    for stage, r in result["stages"].items():
+        line = f"  {stage:<20} {r['logins_per_s']:8.1f} logins/s   median {r['median_ms']:8.1f} ms   p95 {r['p95_ms']:8.1f} ms"
+        if stage in base_stages and base_stages[stage]["logins_per_s"] > 0:
+            line += f"   x{r['logins_per_s'] / base_stages[stage]['logins_per_s']:.2f} vs baseline"
+        print(line)
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": sys.version.split()[0], "pandas": pd.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "git_commit": commit}
+
+def print_result(name, result, baseline=None):
+    print(f"\n{name}: {result['departments']} depts x {result['staff_per_department']} staff x "
+          f"{result['days']} days = {result['rows']} rows")
+    base_stages = (baseline or {}).get("stages", {})
+    for stage, r in result["stages"].items():
+        line = f"  {stage:<20} min {r['min_s'] * 1000:9.1f} ms   median {r['median_s'] * 1000:9.1f} ms"
+        if "peak_mb" in r:
+            line += f"   peak {r['peak_mb']:8.1f} MB"
+        if stage in base_stages and base_stages[stage]["min_s"] > 0:
+            line += f"   x{r['min_s'] / base_stages[stage]['min_s']:.2f} vs baseline"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the attendance pipeline on synthetic ERP data.")
+    parser.add_argument("--tiers", nargs="*", choices=list(TIERS), default=["small", "medium", "dept10", "dept100"],
+                        help="pipeline tiers to run (pass --tiers alone to skip them)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--excel", action="store_true", help="also time workbook ingestion (read_excel and each excel_ingest engine)")
+    parser.add_argument("--login", action="store_true", help="also measure newod.py login throughput")
+    parser.add_argument("--login-users", type=int, default=200, help="login attempts per scenario")
+    parser.add_argument("--login-concurrency", type=int, default=32, help="simultaneous login sessions")
+    parser.add_argument("--bcrypt-rounds", type=int, default=int(os.environ.get("ATTENDANCE_BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    baseline, login_baseline = {}, None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        baseline, login_baseline = previous.get("tiers", {}), previous.get("login")
+
+    report = {"timestamp": datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+              "repeat": args.repeat, "tiers": {}}
+    for name in args.tiers:
+        report["tiers"][name] = run_tier(name, args.repeat, args.excel)
+        print_result(name, report["tiers"][name], baseline.get(name))
+    if args.login:
+        report["login"] = run_login_benchmark(args.login_users, args.login_concurrency, args.bcrypt_rounds)
+        print_login_result(report["login"], login_baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {path}")
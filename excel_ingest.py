@@ -0,0 +1,70 @@
+from datetime import date, datetime, time
+import io
+import os
+
+from attendance_pipeline import assemble_streamed_blocks
+
+# ERP-Portal workbook ingestion without a full all-string DataFrame of the sheet.
+# Each engine yields the first sheet's rows as lists of cell text (None for empty/NA cells), converted the
+# way pd.read_excel(header=None, dtype=str) would; assemble_streamed_blocks keeps only department-block rows.
+#   calamine  Rust reader (pip install python-calamine), used when installed
+#   openpyxl  read-only streaming reader, one row in memory at a time
+# ATTENDANCE_EXCEL_ENGINE=calamine|openpyxl pins the engine.
+
+try:
+    import python_calamine
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# pandas' default na_values, so cell text matches read_excel(dtype=str)
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+              "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+# Error cells arrive as these strings from the value-only readers; read_excel turns them into NaN
+EXCEL_ERRORS = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA"}
+
+def cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in NA_STRINGS or value in EXCEL_ERRORS else value
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return str(int(value))  # read_excel reports integral numbers as ints
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time())  # calamine returns dates where openpyxl returns datetimes
+    return str(value)
+
+def _openpyxl_rows(source):
+    import openpyxl
+    book = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = book.worksheets[0]
+        sheet.reset_dimensions()  # some exports carry a wrong <dimension>; read what is actually there
+        for row in sheet.iter_rows(values_only=True):
+            yield [cell_text(v) for v in row]
+    finally:
+        book.close()
+
+def _calamine_rows(source):
+    sheet = python_calamine.CalamineWorkbook.from_filelike(source).get_sheet_by_index(0)
+    # skip_empty_area=False keeps leading blank rows/columns, so column positions match read_excel
+    for row in sheet.to_python(skip_empty_area=False):
+        yield [cell_text(v) for v in row]
+
+ROW_READERS = {"calamine": _calamine_rows, "openpyxl": _openpyxl_rows}
+
+def default_engine():
+    pinned = os.environ.get("ATTENDANCE_EXCEL_ENGINE", "").strip().lower()
+    if pinned in ROW_READERS and (pinned != "calamine" or HAS_CALAMINE):
+        return pinned
+    return "calamine" if HAS_CALAMINE else "openpyxl"
+
+def iter_sheet_rows(data, engine=None):
+    return ROW_READERS[engine or default_engine()](io.BytesIO(data))
+
+def read_erp_workbook(data, engine=None):
+    # Equivalent to assemble_department_blocks(pd.read_excel(io.BytesIO(data), header=None, dtype=str))
+    return assemble_streamed_blocks(iter_sheet_rows(data, engine))
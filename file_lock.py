@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+# Exclusive locks on a lock file, held across threads and server processes.
+# Used by staff_store.py (daily attendance CSV appends) and attendance_history.py (partition rewrites).
+try:
+    import fcntl
+
+    def lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def exclusive_lock(path):
+    # Each call opens its own handle, so threads of one process also wait for each other
+    with open(path, "a+") as f:
+        lock_file(f)
+        try:
+            yield
+        finally:
+            unlock_file(f)
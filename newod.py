@@ -1,86 +1,12 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import os
-import json
-import bcrypt
 
-# =========== CONFIG =============
-USER_DATA_FILE = "users.json"
-DEFAULT_PASSWORD = "user123"  # Common default for all users
-# ================================
-
-# ---------- UTILITY FUNCTIONS -------------
-def initialize_user_db():
-    if not os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, "w") as f:
-            json.dump({}, f)
-
-def load_user_db():
-    if not os.path.exists(USER_DATA_FILE):
-        initialize_user_db()
-    with open(USER_DATA_FILE, "r") as f:
-        return json.load(f)
-
-def save_user_db(data):
-    with open(USER_DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
-
-def add_user_if_not_exist(user_id):
-    users = load_user_db()
-    if user_id not in users:
-        hashed_pw = bcrypt.hashpw(DEFAULT_PASSWORD.encode(), bcrypt.gensalt()).decode()
-        users[user_id] = {"password_hash": hashed_pw, "name": ""}
-        save_user_db(users)
-
-def authenticate(user_id, password):
-    users = load_user_db()
-    if user_id in users:
-        stored_hash = users[user_id]["password_hash"].encode()
-        return bcrypt.checkpw(password.encode(), stored_hash)
-    return False
-
-def is_default_password(user_id):
-    users = load_user_db()
-    if user_id not in users:
-        return True  # Force new user to change password at first login
-    stored_hash = users[user_id]["password_hash"].encode()
-    return bcrypt.checkpw(DEFAULT_PASSWORD.encode(), stored_hash)
-
-def change_password(user_id, new_password):
-    users = load_user_db()
-    hashed_new = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-    users[user_id]["password_hash"] = hashed_new
-    save_user_db(users)
-
-def get_user_name(user_id):
-    users = load_user_db()
-    return users.get(user_id, {}).get("name", "")
-
-def set_user_name(user_id, name):
-    users = load_user_db()
-    if user_id in users:
-        users[user_id]["name"] = name
-        save_user_db(users)
-
-def save_record(user_id, name, attendance_type, od_reason):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    filename = f"attendance_{today_str}.csv"
-    new_record = pd.DataFrame({
-        "Timestamp": [timestamp],
-        "ID Number": [user_id],
-        "Name": [name],
-        "Attendance Type": [attendance_type],
-        "OD Reason": [od_reason]
-    })
-    if os.path.exists(filename):
-        new_record.to_csv(filename, mode='a', header=False, index=False)
-    else:
-        new_record.to_csv(filename, mode='w', header=True, index=False)
+from staff_store import change_password, get_user_name, initialize_user_db, login, save_record, set_user_name
 
 # --------- STREAMLIT APP ---------
 st.title("Secure Attendance System")
+initialize_user_db()
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -98,12 +24,12 @@ if not st.session_state.logged_in:
             st.error("User ID cannot be empty.")
         else:
             user_id = user_id.strip()
-            add_user_if_not_exist(user_id)
-            if authenticate(user_id, password.strip()):
+            ok, must_change, name = login(user_id, password.strip())
+            if ok:
                 st.session_state.logged_in = True
                 st.session_state.user_id = user_id
-                st.session_state.must_change_password = is_default_password(user_id)
-                st.session_state.name_set = bool(get_user_name(user_id))
+                st.session_state.must_change_password = must_change
+                st.session_state.name_set = bool(name)
                 st.rerun()
             else:
                 st.error("Invalid User ID or Password.")
@@ -163,8 +89,11 @@ else:
                     st.error("Please enter a reason.")
                 else:
                     set_user_name(st.session_state.user_id, name.strip())  # update name if changed
-                    save_record(st.session_state.user_id, name.strip(), attendance_type, od_reason.strip())
+                    ledger_ok = save_record(st.session_state.user_id, name.strip(), attendance_type, od_reason.strip())
                     st.success("Attendance record saved successfully.")
+                    if not ledger_ok:
+                        st.warning("The OD ledger is busy; your entry will be added to it with the next submission. "
+                                   "No need to submit again.")
 
         st.markdown("---")
         st.header("Download Attendance CSV by Date")
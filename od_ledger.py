@@ -0,0 +1,72 @@
+import pandas as pd
+from contextlib import closing
+import csv
+import glob
+import os
+import sqlite3
+
+# Shared by newod.py (writes every submission) and app.py (reads OD/leave entries for merge_od)
+LEDGER_DB_FILE = "od_ledger.db"
+ATTENDANCE_TYPES = ["OD", "Casual Leave (CL)", "SSL", "Special Permission", "Permission"]
+DAILY_CSV_PATTERN = "attendance_*.csv"
+
+def connect_ledger(path=LEDGER_DB_FILE):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS od_ledger ("
+        " id_number TEXT NOT NULL,"
+        " date TEXT NOT NULL,"  # ISO YYYY-MM-DD
+        " attendance_type TEXT NOT NULL,"
+        " name TEXT NOT NULL DEFAULT '',"
+        " od_reason TEXT NOT NULL DEFAULT '',"
+        " timestamp TEXT NOT NULL,"
+        " PRIMARY KEY (id_number, date, attendance_type))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS od_ledger_date ON od_ledger (date, attendance_type)")
+    return conn
+
+def record_entries(records, path=LEDGER_DB_FILE):
+    # records: iterables of (Timestamp, ID Number, Name, Attendance Type, OD Reason), as in the daily CSVs.
+    # A later submission for the same (ID Number, Date, Attendance Type) replaces the earlier one.
+    rows = [(str(uid), str(ts)[:10], atype, name, reason or "", ts) for ts, uid, name, atype, reason in records]
+    with closing(connect_ledger(path)) as conn, conn:
+        conn.executemany(
+            "INSERT INTO od_ledger (id_number, date, attendance_type, name, od_reason, timestamp)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id_number, date, attendance_type) DO UPDATE SET"
+            " name = excluded.name, od_reason = excluded.od_reason, timestamp = excluded.timestamp"
+            " WHERE excluded.timestamp >= od_ledger.timestamp",
+            rows,
+        )
+    return len(rows)
+
+def query_range(start_date, end_date, attendance_types=None, path=LEDGER_DB_FILE):
+    # One indexed range read; columns line up with the OD CSV that merge_od expects
+    sql = ("SELECT id_number AS \"E. Code\", name AS Name, date AS Date,"
+           " attendance_type AS \"Attendance Type\", od_reason AS \"OD Reason\""
+           " FROM od_ledger WHERE date BETWEEN ? AND ?")
+    params = [str(start_date), str(end_date)]
+    if attendance_types:
+        sql += f" AND attendance_type IN ({', '.join('?' * len(attendance_types))})"
+        params += list(attendance_types)
+    with closing(connect_ledger(path)) as conn:
+        od = pd.read_sql_query(sql, conn, params=params)
+    od["Date"] = pd.to_datetime(od["Date"]).dt.date
+    return od
+
+def import_daily_csvs(directory=".", path=LEDGER_DB_FILE):
+    # One-time backfill from the attendance_YYYY-MM-DD.csv files written before the ledger existed
+    total = 0
+    for csv_path in sorted(glob.glob(os.path.join(directory, DAILY_CSV_PATTERN))):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            total += record_entries(
+                ((r["Timestamp"], r["ID Number"], r["Name"], r["Attendance Type"], r.get("OD Reason", ""))
+                 for r in reader),
+                path,
+            )
+    return total
+
+if __name__ == "__main__":
+    print(f"Imported {import_daily_csvs()} record(s) into {LEDGER_DB_FILE}")
@@ -0,0 +1,219 @@
+import streamlit as st
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+import csv
+import io
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+import bcrypt
+
+import od_ledger
+from file_lock import lock_file, unlock_file
+
+# User store and attendance submissions behind newod.py (the staff attendance page)
+
+# =========== CONFIG =============
+USER_DB_FILE = "users.db"
+LEGACY_USER_DATA_FILE = "users.json"  # migrated into USER_DB_FILE once, then renamed
+DEFAULT_PASSWORD = "user123"  # Common default for all users
+BCRYPT_ROUNDS = int(os.environ.get("ATTENDANCE_BCRYPT_ROUNDS", "12"))  # cost factor for new hashes
+HASH_WORKERS = int(os.environ.get("ATTENDANCE_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# ================================
+
+# ---------- UTILITY FUNCTIONS -------------
+def connect_user_db():
+    # WAL lets logins read while another session writes; timeout waits out the write lock
+    conn = sqlite3.connect(USER_DB_FILE, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+@st.cache_resource
+def initialize_user_db():
+    with closing(connect_user_db()) as conn, conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id TEXT PRIMARY KEY,"
+            " password_hash TEXT NOT NULL,"
+            " name TEXT NOT NULL DEFAULT '',"
+            " must_change_password INTEGER)"  # NULL = unknown (migrated row), settled at next login
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        if "must_change_password" not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN must_change_password INTEGER")
+    migrate_legacy_user_db()
+
+def migrate_legacy_user_db():
+    if not os.path.exists(LEGACY_USER_DATA_FILE):
+        return
+    with open(LEGACY_USER_DATA_FILE, "r") as f:
+        users = json.load(f)
+    rows = [(uid, u["password_hash"], u.get("name") or "") for uid, u in users.items()]
+    with closing(connect_user_db()) as conn, conn:
+        # Existing rows win, so re-running the migration never overwrites a changed password
+        conn.executemany("INSERT OR IGNORE INTO users (user_id, password_hash, name) VALUES (?, ?, ?)", rows)
+    os.replace(LEGACY_USER_DATA_FILE, LEGACY_USER_DATA_FILE + ".migrated")
+
+@st.cache_resource
+def get_hash_pool():
+    # bcrypt releases the GIL; a bounded pool keeps a burst of logins from oversubscribing the CPU
+    return ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+def hash_password(password):
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return get_hash_pool().submit(bcrypt.hashpw, password.encode(), salt).result().decode()
+
+def check_password(password, stored_hash):
+    return get_hash_pool().submit(bcrypt.checkpw, password.encode(), stored_hash.encode()).result()
+
+@st.cache_resource
+def get_dummy_hash():
+    # Same cost as real hashes, so rejecting an unknown ID takes as long as a wrong password
+    return hash_password(os.urandom(16).hex())
+
+def get_user(user_id):
+    with closing(connect_user_db()) as conn:
+        return conn.execute("SELECT password_hash, name, must_change_password FROM users WHERE user_id = ?",
+                            (user_id,)).fetchone()
+
+def login(user_id, password):
+    # Exactly one bcrypt operation per attempt; returns (ok, must_change_password, name)
+    user = get_user(user_id)
+    if user is None:
+        if password != DEFAULT_PASSWORD:
+            # Unknown IDs can only sign in with the default password; still pay one checkpw so the
+            # response time does not reveal whether the ID exists
+            check_password(password, get_dummy_hash())
+            return False, False, ""
+        hashed_pw = hash_password(DEFAULT_PASSWORD)
+        with closing(connect_user_db()) as conn, conn:
+            conn.execute("INSERT OR IGNORE INTO users (user_id, password_hash, name, must_change_password) "
+                         "VALUES (?, ?, '', 1)", (user_id, hashed_pw))
+        user = get_user(user_id)  # another session may have created the ID first
+        if user[2] == 1:
+            return True, True, user[1]  # still the default password we just accepted
+        return check_password(password, user[0]), False, user[1]
+    password_hash, name, must_change = user
+    if not check_password(password, password_hash):
+        return False, False, ""
+    if must_change is None:
+        # The password just verified, so comparing it to the default needs no second hash
+        must_change = int(password == DEFAULT_PASSWORD)
+        with closing(connect_user_db()) as conn, conn:
+            conn.execute("UPDATE users SET must_change_password = ? WHERE user_id = ?", (must_change, user_id))
+    return True, bool(must_change), name
+
+def change_password(user_id, new_password):
+    hashed_new = hash_password(new_password)
+    with closing(connect_user_db()) as conn, conn:
+        conn.execute("UPDATE users SET password_hash = ?, must_change_password = ? WHERE user_id = ?",
+                     (hashed_new, int(new_password == DEFAULT_PASSWORD), user_id))
+
+def get_user_name(user_id):
+    user = get_user(user_id)
+    return user[1] if user is not None else ""
+
+def set_user_name(user_id, name):
+    with closing(connect_user_db()) as conn, conn:
+        conn.execute("UPDATE users SET name = ? WHERE user_id = ?", (name, user_id))
+
+# ---------- ATTENDANCE RECORD WRITER -------------
+RECORD_COLUMNS = ["Timestamp", "ID Number", "Name", "Attendance Type", "OD Reason"]
+RECORD_LOCK_FILE = "attendance.lock"  # serializes writers across server processes
+RECORD_FLUSH_INTERVAL = 0.05  # seconds a batch stays open for more submissions
+RECORD_MAX_BATCH = 500
+
+# Group-commits submissions from all sessions: one locked append + fsync per batch
+class AttendanceRecordWriter:
+    def __init__(self):
+        self.pending = queue.Queue()
+        self.handle = None
+        self.handle_name = None
+        self.lock_handle = open(RECORD_LOCK_FILE, "a+")
+        self.ledger_backlog = []  # rows already in the CSV whose ledger upsert has not succeeded yet
+        threading.Thread(target=self._run, name="attendance-record-writer", daemon=True).start()
+
+    def submit(self, filename, row):
+        done = Future()
+        self.pending.put((filename, row, done))
+        return done
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + RECORD_FLUSH_INTERVAL
+            while len(batch) < RECORD_MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            by_file = {}
+            for filename, row, done in batch:
+                by_file.setdefault(filename, []).append((row, done))
+            for filename, items in by_file.items():
+                rows = [row for row, _ in items]
+                try:
+                    self._write(filename, rows)
+                except Exception as e:
+                    for _, done in items:
+                        done.set_exception(e)
+                    continue
+                # The CSV is the commit point: a ledger failure must not make users resubmit saved rows
+                ledger_ok = self._record_ledger(rows)
+                for _, done in items:
+                    done.set_result(ledger_ok)
+
+    def _open(self, filename):
+        # Keep the current day's file open; a new date closes the previous one
+        if self.handle_name != filename:
+            if self.handle is not None:
+                self.handle.close()
+            self.handle = open(filename, "a", newline="", encoding="utf-8")
+            self.handle_name = filename
+        return self.handle
+
+    def _write(self, filename, rows):
+        handle = self._open(filename)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator=os.linesep)
+        lock_file(self.lock_handle)
+        try:
+            if os.fstat(handle.fileno()).st_size == 0:
+                writer.writerow(RECORD_COLUMNS)  # decided under the lock, so exactly one header per file
+            writer.writerows(rows)
+            handle.write(buf.getvalue())
+            handle.flush()
+            os.fsync(handle.fileno())
+        finally:
+            unlock_file(self.lock_handle)
+
+    def _record_ledger(self, rows):
+        # One transaction per batch, keyed for merge_od lookups; failed rows (e.g. SQLite busy) are retried
+        # with the next batch, and the upsert makes a retry harmless
+        self.ledger_backlog.extend(rows)
+        try:
+            od_ledger.record_entries(self.ledger_backlog)
+        except Exception:
+            return False
+        self.ledger_backlog = []
+        return True
+
+@st.cache_resource
+def get_record_writer():
+    return AttendanceRecordWriter()
+
+def save_record(user_id, name, attendance_type, od_reason):
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    filename = f"attendance_{now.strftime('%Y-%m-%d')}.csv"
+    row = [timestamp, user_id, name, attendance_type, od_reason]
+    # Block until the batch holding this row is on disk, so "saved" is only shown once it is.
+    # Returns False when the row is saved but its OD ledger entry is still pending a retry.
+    return get_record_writer().submit(filename, row).result(timeout=30)
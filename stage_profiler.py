@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import threading
+import time
+import tracemalloc
+import weakref
+
+# Opt-in per-stage wall time / row count / peak allocation for app.py reruns.
+# tracemalloc is process-wide, so it runs while at least one profiler is active; with several sessions
+# profiling at once the peaks include each other's allocations.
+METRICS_LOG_FILE = "stage_metrics.jsonl"
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+def _acquire_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+def _release_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+class StageProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self._stack = []  # open stages: [start bytes, highest peak seen by nested stages]
+        if enabled:
+            _acquire_tracing()
+            # Also released if the rerun is interrupted before finish() (e.g. st.rerun, widget change)
+            self._release = weakref.finalize(self, _release_tracing)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # Yields the record dict so callers can fill in "rows" once the output size is known
+        record = {"stage": name, "rows": rows}
+        if not self.enabled:
+            yield record
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        record["depth"] = len(self._stack)
+        self.records.append(record)  # in start order, so nested stages follow their parent
+        frame = [current, current]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._stack.pop()
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            record["peak_mb"] = round((peak - frame[0]) / 2**20, 2)
+
+    def finish(self, source=None, path=METRICS_LOG_FILE):
+        # Appends one JSON line per rerun and stops tracing for this profiler
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._release()
+        if self.records:
+            line = {"timestamp": datetime.now().isoformat(timespec="seconds"), "source": source,
+                    "stages": self.records}
+            with open(path, "a") as f:
+                f.write(json.dumps(line, default=str) + "\n")
@@ -0,0 +1,121 @@
+import pandas as pd
+import numpy as np
+from datetime import date, timedelta
+import argparse
+import io
+import os
+
+# Synthetic ERP-Portal exports for benchmarks and manual testing.
+# A day's workbook mirrors the real layout: title rows, then per department a "Department" marker row,
+# a header row and one row per staff member, separated by blank rows.
+
+ERP_HEADERS = ["S.No", "E. Code", "Name", "Shift", "InTime", "OutTime", "Tot. Dur.", "Status", "Remarks"]
+DEPARTMENT_NAMES = [
+    "Computer Science", "Electronics", "Mechanical", "Civil", "Electrical", "Information Technology",
+    "Mathematics", "Physics", "Chemistry", "English", "Management Studies", "Library", "Administration",
+]
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Suresh", "Lakshmi", "Vignesh", "Anitha", "Ramesh", "Kavya",
+               "Manoj", "Deepa", "Senthil", "Revathi", "Prakash", "Meena", "Ganesh", "Sangeetha", "Vijay", "Nithya"]
+LAST_NAMES = ["Kumar", "R", "S", "Raj", "Devi", "Krishnan", "Murugan", "Subramanian", "Natarajan", "Balaji"]
+STATUSES = np.array(["Present", "Absent", "½Present", "Present"])
+STATUS_WEIGHTS = [0.80, 0.10, 0.05, 0.05]
+
+def department_names(n):
+    names = [DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)] for i in range(n)]
+    return [name if i < len(DEPARTMENT_NAMES) else f"{name} {i // len(DEPARTMENT_NAMES) + 1}"
+            for i, name in enumerate(names)]
+
+def make_staff(departments, staff_per_department, rng):
+    depts = np.repeat(department_names(departments), staff_per_department)
+    n = len(depts)
+    names = [f"{FIRST_NAMES[a]} {LAST_NAMES[b]}" for a, b in
+             zip(rng.integers(0, len(FIRST_NAMES), n), rng.integers(0, len(LAST_NAMES), n))]
+    return pd.DataFrame({
+        "Department": depts,
+        "E. Code": [f"E{i:05d}" for i in range(1, n + 1)],
+        "Name": names,  # collisions are intentional: real staff lists have them too
+        "Shift": rng.choice(["GS", "GS", "GS", "S1", "S2"], n),
+    })
+
+def _hhmm(minutes, with_seconds):
+    minutes = pd.Series(np.clip(minutes, 0, 24 * 60 - 1).astype(int))
+    text = (minutes // 60).astype(str).str.zfill(2) + ":" + (minutes % 60).astype(str).str.zfill(2)
+    return text + ":00" if with_seconds else text
+
+def make_day_rows(staff, missing_rate, rng):
+    # One cleaned-CSV style row per staff member for a single day
+    n = len(staff)
+    status = rng.choice(STATUSES, n, p=STATUS_WEIGHTS)
+    absent = status == "Absent"
+    in_min = rng.normal(8 * 60 + 55, 12, n)
+    dur_min = rng.normal(7 * 60, 60, n)
+    day = staff.copy()
+    day["InTime"] = _hhmm(in_min, True).where(~absent, "")
+    day["OutTime"] = _hhmm(in_min + dur_min, True).where(~absent, "")
+    day["Tot. Dur."] = _hhmm(dur_min, False).where(~absent, "")
+    day["Status"] = status
+    day["Remarks"] = np.where(rng.random(n) < 0.05, "Permission", "")
+    for col in ["Shift", "InTime", "OutTime", "Tot. Dur.", "Remarks"]:
+        day.loc[rng.random(n) < missing_rate, col] = ""
+    day.loc[rng.random(n) < missing_rate / 5, "E. Code"] = ""  # rows the parser must drop
+    return day
+
+def to_erp_raw(day_rows):
+    # Lay the rows out like the ERP sheet and parse them the way app.py reads it:
+    # read_excel(header=None, dtype=str) gives strings with NaN for blanks, which read_csv(dtype=str) matches
+    width = len(ERP_HEADERS)
+    serial = day_rows.groupby("Department", sort=False).cumcount() + 1
+    body = day_rows.assign(**{"S.No": serial.astype(str)})[ERP_HEADERS].to_numpy(dtype=object)
+    depts = day_rows["Department"].to_numpy(dtype=object)
+    starts = np.flatnonzero(np.r_[True, depts[1:] != depts[:-1]])  # make_staff keeps departments contiguous
+    lines = [["Staff Attendance Report"] + [""] * (width - 1), [""] * width]
+    for begin, end in zip(starts, np.r_[starts[1:], len(depts)]):
+        lines.append(["Department", "", depts[begin]] + [""] * (width - 3))
+        lines.append(ERP_HEADERS)
+        lines.extend(body[begin:end].tolist())
+        lines.append([""] * width)
+    buf = io.StringIO()
+    pd.DataFrame(lines).to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    return pd.read_csv(buf, header=None, dtype=str)
+
+def make_od_list(staff, dates, od_rate, rng):
+    rows = []
+    for day in dates:
+        picked = staff[rng.random(len(staff)) < od_rate]
+        rows.append(pd.DataFrame({"E. Code": picked["E. Code"], "Name": picked["Name"], "Date": day}))
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=["E. Code", "Name", "Date"])
+
+def generate_dataset(departments=10, staff_per_department=20, days=1, missing_rate=0.02, od_rate=0.03,
+                     start=date(2025, 1, 6), seed=0):
+    rng = np.random.default_rng(seed)
+    staff = make_staff(departments, staff_per_department, rng)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    day_rows = {day: make_day_rows(staff, missing_rate, rng) for day in dates}
+    return {
+        "staff": staff,
+        "dates": dates,
+        "day_rows": day_rows,
+        "raw_days": {day: to_erp_raw(rows) for day, rows in day_rows.items()},
+        "od": make_od_list(staff, dates, od_rate, rng),
+    }
+
+def write_dataset(dataset, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for day, raw in dataset["raw_days"].items():
+        raw.to_excel(os.path.join(out_dir, f"erp_{day.isoformat()}.xlsx"), header=False, index=False)
+    dataset["od"].to_csv(os.path.join(out_dir, "od_list.csv"), index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic ERP-Portal workbooks and an OD list.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--departments", type=int, default=10)
+    parser.add_argument("--staff", type=int, default=20, help="staff per department")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--od-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_dataset(generate_dataset(args.departments, args.staff, args.days, args.missing_rate, args.od_rate,
+                                   seed=args.seed), args.out_dir)
+    print(f"Wrote {args.days} workbook(s) and od_list.csv to {args.out_dir}")
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import attendance_history
+
+pytest.importorskip("pyarrow")
+
+DAY = date(2025, 1, 6)
+SOURCES = 8
+STAFF_PER_SOURCE = 25
+
+def source_frame(n):
+    # One upload per source: its own staff, all on the same date, so every write hits one partition
+    codes = [f"S{n}-{i:03d}" for i in range(STAFF_PER_SOURCE)]
+    return pd.DataFrame({"E. Code": codes, "Name": codes, "Date": DAY, "Is_Present": 1, "Is_Absent": 0})
+
+def add_sources(workdir, sources):
+    os.chdir(workdir)
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        list(pool.map(lambda n: attendance_history.add_to_history(source_frame(n), f"file{n}.xlsx"), sources))
+
+def assert_all_recorded(sources):
+    part = attendance_history.read_history_partition(DAY)
+    assert len(part) == len(sources) * STAFF_PER_SOURCE
+    assert set(part["Source"]) == {f"file{n}.xlsx" for n in sources}
+    assert set(attendance_history.load_history_manifest()) == {f"file{n}.xlsx" for n in sources}
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path)
+
+def test_concurrent_sessions_keep_every_source(workdir):
+    # Without the lock, each writer rewrites the shared partition/manifest from a stale read
+    add_sources(workdir, range(SOURCES))
+    assert_all_recorded(range(SOURCES))
+
+def test_concurrent_processes_keep_every_source(workdir):
+    # Dashboard sessions in separate server processes and the batch CLI share only the lock file
+    context = multiprocessing.get_context("spawn")
+    procs = [context.Process(target=add_sources, args=(workdir, range(p, SOURCES, 2))) for p in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+    assert_all_recorded(range(SOURCES))
+
+def test_redated_source_leaves_old_partition(workdir):
+    attendance_history.add_to_history(source_frame(0), "file0.xlsx")
+    attendance_history.add_to_history(source_frame(0).assign(Date=date(2025, 1, 7)), "file0.xlsx")
+    assert attendance_history.list_history_dates() == [date(2025, 1, 7)]
+    assert attendance_history.load_history_manifest() == {"file0.xlsx": ["2025-01-07"]}
@@ -0,0 +1,141 @@
+import io
+
+import pandas as pd
+import pytest
+
+from attendance_pipeline import (
+    assemble_department_blocks, assemble_streamed_blocks, feature_engineering, process_attendance_excel,
+)
+from excel_ingest import HAS_CALAMINE, read_erp_workbook
+from synthetic_erp import generate_dataset
+
+# Equivalence with the original row-by-row block scan of process_attendance_excel (before feature_engineering),
+# for both the DataFrame parser and the streamed workbook readers
+
+ENGINES = ["openpyxl"] + (["calamine"] if HAS_CALAMINE else [])
+LAYOUT_A = ["S.No", "E. Code", "Name", "Shift", "InTime", "OutTime", "Tot. Dur.", "Status", "Remarks"]
+LAYOUT_B = ["S.No", "E. Code", "Name", None, " InTime", "Tot. Dur.", "Status"]  # gap -> unnamed_3
+
+def reference_blocks(raw):
+    tables = []
+    i = 0
+    while i < len(raw):
+        if raw.iloc[i].astype(str).str.fullmatch("Department", na=False).any():
+            dept_row = raw.iloc[i]
+            dept_name = next((v.strip() for v in dept_row.values if isinstance(v, str) and v.strip() not in ["", "Department"]), None)
+            header_row = i + 1
+            data_start = header_row + 1
+            data_end = data_start
+            header_vals = raw.iloc[header_row].tolist()
+            cols_used = [j for j, v in enumerate(header_vals) if isinstance(v, str) and v.strip() != ""]
+            if not cols_used:
+                i = data_end
+                continue
+            last_col = max(cols_used)
+            headers = [header_vals[j] if isinstance(header_vals[j], str) and header_vals[j].strip() != '' else f'unnamed_{j}' for j in range(last_col + 1)]
+            while data_end < len(raw) and not raw.iloc[data_end].astype(str).str.fullmatch("Department", na=False).any():
+                data_end += 1
+            datablock = raw.iloc[data_start:data_end, :last_col + 1].copy()
+            datablock.columns = headers
+            datablock["Department"] = dept_name
+            if 'E. Code' in datablock.columns:
+                datablock = datablock[datablock["E. Code"].notnull() & (datablock["E. Code"].str.strip() != "")]
+            if not datablock.empty:
+                tables.append(datablock.reset_index(drop=True))
+            i = data_end
+        else:
+            i += 1
+    if not tables:
+        return pd.DataFrame()
+    df = pd.concat(tables, ignore_index=True)
+    if " InTime" in df.columns and "InTime" not in df.columns:
+        df = df.rename(columns={" InTime": "InTime"})
+    return df
+
+def staff_row(width, code, n):
+    row = [str(n), code, f"Staff {n}", "GS", "09:0{}:00".format(n % 10), "17:00:00", "08:00", "Present", "", "stray"]
+    return row[:width] + ([None, "trailing cell"] if n % 4 == 0 else [])
+
+def edge_case_sheet():
+    rows = [
+        ["Attendance Report for 06-01-2025"],
+        [],
+        ["Department", "Computer Science"],
+        LAYOUT_A,
+        staff_row(9, "E001", 1),
+        staff_row(9, None, 2),        # blank E. Code rows are dropped
+        staff_row(9, "   ", 3),
+        staff_row(9, "E004", 4),
+        [],
+        ["Department", None, " Mathematics "],
+        LAYOUT_B,
+        staff_row(7, "E101", 5),
+        staff_row(7, "E102", 6),
+        ["Department", "Physics"],
+        [],                           # empty header: the whole block is skipped
+        staff_row(9, "E201", 7),
+        ["Department", "Chemistry"],
+        ["Department", "Biology", "E. Code", "Name"],  # header row that is itself a marker
+        ["x", "y", "E301", "Bio Staff"],
+        ["x", "y", "", "No Code"],
+        ["Department", "Arts"],
+        LAYOUT_A,
+        staff_row(9, "E401", 8),
+        ["Department", "Empty Block"],
+        LAYOUT_A,
+        staff_row(9, None, 9),
+        ["Department", "English"],
+        LAYOUT_A,
+        staff_row(9, "E501", 10),
+        staff_row(9, "E502", 12),
+    ]
+    return rows
+
+def to_xlsx(rows):
+    buf = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buf, header=False, index=False)
+    return buf.getvalue()
+
+def read_raw(data):
+    return pd.read_excel(io.BytesIO(data), header=None, dtype=str)
+
+def assert_matches_reference(data, expected):
+    raw = read_raw(data)
+    pd.testing.assert_frame_equal(assemble_department_blocks(raw), expected)
+    for engine in ENGINES:
+        pd.testing.assert_frame_equal(read_erp_workbook(data, engine), expected, obj=engine)
+
+def test_edge_case_sheet_matches_reference():
+    data = to_xlsx(edge_case_sheet())
+    expected = reference_blocks(read_raw(data))
+    assert expected.loc[expected["E. Code"] == "E301", "Department"].tolist() == ["Chemistry"]  # marker row as header
+    assert "unnamed_3" in expected.columns
+    assert_matches_reference(data, expected)
+
+def test_trailing_marker_is_ignored():
+    # The original scan raised IndexError on a marker in the last row; the rest of the sheet is unchanged
+    rows = edge_case_sheet()
+    expected = reference_blocks(read_raw(to_xlsx(rows)))
+    assert_matches_reference(to_xlsx(rows + [["Department", "Trailing"]]), expected)
+
+def test_marker_without_department_name():
+    # The original left None in an object column where the block parsers leave NaN in a str column;
+    # the engineered frame the dashboard uses is identical
+    rows = [r if r != ["Department", "Arts"] else ["Department"] for r in edge_case_sheet()]
+    data = to_xlsx(rows)
+    expected = feature_engineering(reference_blocks(read_raw(data)))
+    assert expected["Department"].isna().sum() == 1
+    pd.testing.assert_frame_equal(process_attendance_excel(read_raw(data)), expected)
+    for engine in ENGINES:
+        pd.testing.assert_frame_equal(feature_engineering(read_erp_workbook(data, engine)), expected, obj=engine)
+
+@pytest.mark.parametrize("departments", [1, 25])
+def test_synthetic_export_matches_reference(departments):
+    raw_days = generate_dataset(departments, 15, 1)["raw_days"]
+    data = to_xlsx(next(iter(raw_days.values())).values.tolist())
+    assert_matches_reference(data, reference_blocks(read_raw(data)))
+
+def test_streamed_rows_match_dataframe_parser():
+    raw = read_raw(to_xlsx(edge_case_sheet()))
+    rows = ([None if pd.isna(v) else v for v in row] for row in raw.itertuples(index=False))
+    pd.testing.assert_frame_equal(assemble_streamed_blocks(rows), assemble_department_blocks(raw))
@@ -0,0 +1,78 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import itertools
+
+from attendance_pipeline import feature_engineering
+
+# Equivalence with the original row-wise strptime/apply implementation of feature_engineering
+
+INTIMES = ["09:00:00", "9:5:3", "24:00:00", "10:00:60", "", None, "08:59", "abc", " 09:15:00 ", "23:59:59",
+           "00:00:00", "09:60:00", "1:2:3:4", "009:00:00", "9:05:03"]
+DURATIONS = ["06:30", "6:5", "24:00", "07:15:30", "10:60", "", None, "abc", "5:07:60", "0:0", "23:59:59", "6:00"]
+NUMERIC_COLS = ["Delay_Minutes", "Delay_Flag", "TotDur_min", "Early_Leave_Min", "Overtime_Min",
+                "Is_Absent", "Is_Present", "Is_Half_Day", "Has_Permission"]
+
+def reference_feature_engineering(df):
+    df = df.copy()
+    df['InTime'] = df.get('InTime', '').fillna('').astype(str).str.strip()
+
+    def parse_time(s):
+        try:
+            return datetime.strptime(s, '%H:%M:%S').time() if s and ':' in s else np.nan
+        except ValueError:
+            return np.nan
+    in_obj = df['InTime'].apply(parse_time)
+
+    tot_dur = df['Tot. Dur.'].fillna('').astype(str).str.strip()
+    def parse_dur(s):
+        for fmt in ('%H:%M:%S', '%H:%M'):
+            try:
+                if s and ':' in s:
+                    t = datetime.strptime(s, fmt)
+                    return t.hour * 60 + t.minute
+            except ValueError:
+                continue
+        return np.nan
+    df['TotDur_min'] = tot_dur.apply(parse_dur)
+
+    df['Delay_Minutes'] = in_obj.apply(lambda t: (t.hour - 9) * 60 + t.minute if pd.notnull(t) else np.nan)
+    df['Delay_Flag'] = (df['Delay_Minutes'] > 0).astype(int)
+    df['Early_Leave_Min'] = df['TotDur_min'].apply(lambda x: 360 - x if pd.notnull(x) and x < 360 else 0)
+    df['Overtime_Min'] = df['TotDur_min'].apply(lambda x: x - 360 if pd.notnull(x) and x > 360 else 0)
+
+    status = df['Status'].fillna('').str.lower()
+    remarks = df['Remarks'].fillna('').str.lower()
+    df['Is_Absent'] = status.str.contains("absent").astype(int)
+    df['Is_Present'] = status.str.contains("present").astype(int)
+    df['Is_Half_Day'] = status.str.contains("½present").astype(int)
+    df['Has_Permission'] = remarks.str.contains("permission").astype(int)
+    return df
+
+def make_rows():
+    pairs = list(itertools.product(INTIMES, DURATIONS))
+    statuses = ["Present", "Absent", "½Present", None, "OD"]
+    return pd.DataFrame({
+        "Department": "Physics",
+        "E. Code": [f"E{i:03d}" for i in range(len(pairs))],
+        "Name": [f"Staff {i}" for i in range(len(pairs))],
+        "Shift": ["GS" if i % 3 else None for i in range(len(pairs))],
+        "InTime": [p[0] for p in pairs],
+        "Tot. Dur.": [p[1] for p in pairs],
+        "Status": [statuses[i % len(statuses)] for i in range(len(pairs))],
+        "Remarks": ["Permission" if i % 4 == 0 else None for i in range(len(pairs))],
+    }, dtype=object)
+
+def test_numeric_columns_match_reference():
+    rows = make_rows()
+    got = feature_engineering(rows)
+    expected = reference_feature_engineering(rows)
+    for col in NUMERIC_COLS:
+        actual = pd.to_numeric(got[col]).astype("float64").to_numpy(na_value=np.nan)
+        np.testing.assert_array_equal(actual, expected[col].astype("float64").to_numpy(), err_msg=col)
+
+def test_text_columns_are_cleaned_like_reference():
+    rows = make_rows()
+    got = feature_engineering(rows)
+    assert got['InTime'].astype(str).tolist() == reference_feature_engineering(rows)['InTime'].tolist()
+    assert got['Shift'].astype(str).tolist() == rows['Shift'].fillna('GS').tolist()
@@ -0,0 +1,118 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from attendance_pipeline import CATEGORY_COLS, FLAG_COLS, merge_od, process_attendance_excel
+from synthetic_erp import generate_dataset
+
+# Equivalence with the original row-wise apply implementation of merge_od
+
+def reference_merge_od(main_df, od_data, match_on="Name"):
+    # As originally written for (Name, Date); match_on generalizes the lookup column, with E. Codes compared
+    # as trimmed text the way merge_od documents
+    main_df = main_df.copy()
+    od_data = od_data.copy()
+    main_df['Date'] = pd.to_datetime(main_df['Date'], errors='coerce').dt.date
+    od_data['Date'] = pd.to_datetime(od_data['Date'], errors='coerce').dt.date
+    key = (lambda v: str(v).strip()) if match_on == "E. Code" else (lambda v: v)
+    od_set = set((key(k), d) for k, d in od_data[[match_on, 'Date']].dropna().itertuples(index=False, name=None))
+
+    def status_update(row):
+        k = (key(row[match_on]) if pd.notna(row[match_on]) else None, row['Date'])
+        if k in od_set and row.get('Is_Absent', 0) == 1:
+            return 'OD'
+        return row.get('Status', '')
+
+    main_df['Status_old'] = main_df.get('Status', '')
+    main_df['Status'] = main_df.apply(status_update, axis=1)
+    main_df['Is_OD'] = (main_df['Status'] == 'OD').astype(int)
+    main_df.loc[main_df['Is_OD'] == 1, 'Is_Absent'] = 0
+    main_df.loc[main_df['Is_OD'] == 1, 'Is_Present'] = 0
+    return main_df
+
+def legacy_frame(frame):
+    # The int flags and plain object columns the original merge_od ran on
+    return frame.astype({**{c: int for c in FLAG_COLS if c in frame.columns},
+                         **{c: object for c in CATEGORY_COLS if c in frame.columns}})
+
+def assert_same_merge(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns:
+        if col in FLAG_COLS:
+            assert result[col].tolist() == expected[col].fillna(0).astype(bool).tolist(), col
+        else:
+            assert result[col].astype(object).where(result[col].notna(), None).tolist() == \
+                   expected[col].astype(object).where(expected[col].notna(), None).tolist(), col
+
+@pytest.fixture(scope="module")
+def dataset():
+    data = generate_dataset(8, 20, 3, od_rate=0.2)
+    frames = []
+    for day, raw in data["raw_days"].items():
+        frame = process_attendance_excel(raw)
+        frame["Date"] = day
+        frames.append(frame)
+    main = pd.concat(frames, ignore_index=True)
+    # Every absentee of the first day is on duty too, so hits are guaranteed alongside the random list
+    absent = main[main["Is_Absent"] & (main["Date"] == data["dates"][0])]
+    od = pd.concat([data["od"], absent[["E. Code", "Name", "Date"]].astype({"Name": str})], ignore_index=True)
+    return main, od
+
+@pytest.mark.parametrize("match_on", ["Name", "E. Code"])
+def test_matches_reference(dataset, match_on):
+    main, od = dataset
+    result = merge_od(main, od, match_on)
+    assert result["Is_OD"].sum() > 0
+    assert_same_merge(result, reference_merge_od(legacy_frame(main), od, match_on))
+
+def small_frame():
+    return pd.DataFrame({
+        "E. Code": ["1001", "1002", "1003", "1004", None],
+        "Name": ["Asha", "Bala", "Chitra", "Asha", "Dev"],
+        "Date": [date(2025, 1, 6)] * 5,
+        "Status": ["Absent", "Absent", "Present", "Absent", "Absent"],
+        "Is_Absent": [True, True, False, True, True],
+        "Is_Present": [False, False, True, False, False],
+    })
+
+def test_numeric_codes_match_text_codes():
+    # Codes read from a CSV without dtype=str arrive as numbers; padded text codes are trimmed
+    od = pd.DataFrame({"E. Code": [1001, 1003, 9999], "Date": ["2025-01-06"] * 3})
+    padded = pd.DataFrame({"E. Code": [" 1002 "], "Date": ["2025-01-06"]})
+    main = small_frame()
+    for od_data in (od, padded):
+        assert_same_merge(merge_od(main, od_data, "E. Code"), reference_merge_od(legacy_frame(main), od_data, "E. Code"))
+    assert merge_od(main, od, "E. Code")["Status"].tolist() == ["OD", "Absent", "Present", "Absent", "Absent"]
+    assert merge_od(main, padded, "E. Code")["Is_OD"].tolist() == [False, True, False, False, False]
+
+def test_name_match_ignores_codes():
+    od = pd.DataFrame({"Name": ["Asha", "Dev"], "Date": [date(2025, 1, 6)] * 2})
+    main = small_frame()
+    result = merge_od(main, od)
+    assert result["Is_OD"].tolist() == [True, False, False, True, True]  # same name, different staff
+    assert_same_merge(result, reference_merge_od(legacy_frame(main), od))
+
+def test_missing_status_column():
+    od = pd.DataFrame({"Name": ["Asha"], "Date": [date(2025, 1, 6)]})
+    main = small_frame().drop(columns="Status")
+    assert_same_merge(merge_od(main, od), reference_merge_od(legacy_frame(main), od))
+
+def test_missing_is_absent_column():
+    # Without Is_Absent nobody can be marked absent, so nothing becomes OD
+    od = pd.DataFrame({"Name": ["Asha"], "Date": [date(2025, 1, 6)]})
+    main = small_frame().drop(columns="Is_Absent")
+    result = merge_od(main, od)
+    assert not result["Is_OD"].any()
+    assert result["Status"].tolist() == main["Status"].tolist()
+
+def test_merging_twice_keeps_first_status_old():
+    # The dashboard merges the uploaded OD list and the ledger one after the other
+    main = small_frame()
+    by_name = pd.DataFrame({"Name": ["Asha"], "Date": [date(2025, 1, 6)]})
+    by_code = pd.DataFrame({"E. Code": ["1002", "1001"], "Date": [date(2025, 1, 6)] * 2})
+    result = merge_od(merge_od(main, by_name), by_code, "E. Code")
+    assert result["Status_old"].tolist() == main["Status"].tolist()
+    assert result["Status"].tolist() == ["OD", "OD", "Present", "OD", "Absent"]
+    assert result["Is_OD"].tolist() == [True, True, False, True, False]
+    assert not (result["Is_Absent"] & result["Is_OD"]).any()
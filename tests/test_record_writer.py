@@ -0,0 +1,78 @@
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+import od_ledger
+import staff_store
+
+SUBMISSIONS_PER_PROCESS = 150
+PROCESSES = 3
+
+def submit_from_threads(workdir, tag, count):
+    # Simulates `count` sessions pressing Submit at once against this process's shared writer
+    os.chdir(workdir)
+    writer = staff_store.AttendanceRecordWriter()
+    rows = [["2025-01-06 09:00:00", f"{tag}-{i}", f"Staff {i}", "OD", ""] for i in range(count)]
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(lambda r: writer.submit("attendance_2025-01-06.csv", r).result(timeout=60), row)
+                   for row in rows]
+        for future in futures:
+            future.result()
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def load_ledger_ids(workdir):
+    return set(od_ledger.query_range(date(2025, 1, 6), date(2025, 1, 6),
+                                     path=os.path.join(workdir, od_ledger.LEDGER_DB_FILE))["E. Code"])
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path)
+
+def test_concurrent_submissions_in_one_process(workdir):
+    submit_from_threads(workdir, "t", 300)
+    rows = read_rows(os.path.join(workdir, "attendance_2025-01-06.csv"))
+    assert rows[0] == staff_store.RECORD_COLUMNS
+    assert len(rows) == 301
+    assert sorted(r[1] for r in rows[1:]) == sorted(f"t-{i}" for i in range(300))
+
+def test_concurrent_submissions_across_processes(workdir):
+    # Separate server processes share only the lock file: still exactly one header and no torn rows
+    context = multiprocessing.get_context("spawn")
+    procs = [context.Process(target=submit_from_threads, args=(workdir, f"p{n}", SUBMISSIONS_PER_PROCESS))
+             for n in range(PROCESSES)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+    rows = read_rows(os.path.join(workdir, "attendance_2025-01-06.csv"))
+    header = staff_store.RECORD_COLUMNS
+    assert rows[0] == header
+    assert sum(r == header for r in rows) == 1
+    assert all(len(r) == len(header) for r in rows)
+    assert len(rows) == 1 + PROCESSES * SUBMISSIONS_PER_PROCESS
+    assert len(load_ledger_ids(workdir)) == PROCESSES * SUBMISSIONS_PER_PROCESS
+
+def test_ledger_failure_keeps_csv_row_and_retries(workdir, monkeypatch):
+    writer = staff_store.AttendanceRecordWriter()
+    real_record_entries = od_ledger.record_entries
+    def busy(rows, *args, **kwargs):
+        raise od_ledger.sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(od_ledger, "record_entries", busy)
+    first = ["2025-01-06 09:00:00", "E1", "Asha", "OD", "seminar"]
+    assert writer.submit("attendance_2025-01-06.csv", first).result(timeout=10) is False
+
+    monkeypatch.setattr(od_ledger, "record_entries", real_record_entries)
+    second = ["2025-01-06 09:05:00", "E2", "Bala", "OD", "workshop"]
+    assert writer.submit("attendance_2025-01-06.csv", second).result(timeout=10) is True
+    rows = read_rows(os.path.join(workdir, "attendance_2025-01-06.csv"))
+    assert [r[1] for r in rows[1:]] == ["E1", "E2"]  # saved once, no resubmission needed
+    assert load_ledger_ids(workdir) == {"E1", "E2"}